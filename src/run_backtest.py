@@ -3,18 +3,35 @@ from __future__ import annotations
 # argparse — чтобы запускать файл из консоли с параметрами (например, --config ...)
 import argparse
 
+# json/os — для on-disk кэша уже распарсенного конфига (см. load_config)
+import json
+import os
+
+# functools.lru_cache — in-process мемоизация load_config
+import functools
+
+# MappingProxyType — read-only view на dict: закэшированный RunConfig нельзя "испортить"
+from types import MappingProxyType
+
 # dataclass — удобный способ описать "структурированный конфиг" как объект с полями
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 # Path — удобнее, чем строки, когда работаешь с путями к файлам
 from pathlib import Path
 
-# Any/Dict — типы, чтобы не гадать, что лежит в сыром YAML
-from typing import Any, Dict
+# Any/Dict/Mapping — типы, чтобы не гадать, что лежит в сыром YAML
+from typing import Any, Dict, Mapping
 
 # PyYAML — читаем YAML-конфиг
 import yaml
 
+# libyaml (C-парсер) в разы быстрее чистого Python-парсера PyYAML.
+# Если PyYAML собран без libyaml — тихо откатываемся на SafeLoader.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 # Импортируем наши компоненты (все они — каркасы/заглушки, реализацию допишем позже)
 from toy_trader.data_sources import YahooDataSource, CSVDataSource
 from toy_trader.strategies import SMACrossStrategy, SMACrossParams
@@ -22,7 +39,7 @@ from toy_trader.execution import NextBarExecutionModel, ExecutionParams
 from toy_trader.engine import BacktestEngine
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RunConfig:
     """
     Это "нормализованный" конфиг запуска.
@@ -31,30 +48,119 @@ class RunConfig:
     - YAML после чтения превращается в dict/dict/dict (не очень удобно и легко ошибиться ключом)
     - RunConfig делает явными основные секции и типы
     - в будущем его можно расширять без переписывания кучи кода
+
+    Секции — read-only MappingProxyType: load_config мемоизирован,
+    и один и тот же объект может отдаваться нескольким вызывающим.
     """
-    data: Dict[str, Any]
-    strategy: Dict[str, Any]
-    execution: Dict[str, Any]
+    data: Mapping[str, Any]
+    strategy: Mapping[str, Any]
+    execution: Mapping[str, Any]
     initial_cash: float
 
 
-def load_config(path: str | Path) -> RunConfig:
+def _config_cache_path(path: Path, st: os.stat_result) -> Path:
+    """
+    Путь к JSON-кэшу распарсенного YAML.
+
+    Ключ — mtime (ns) + размер файла: если конфиг поменяли, ключ меняется,
+    и старый кэш просто перестаёт находиться.
+    """
+    return path.parent / ".cache" / f"{path.name}.{st.st_mtime_ns}_{st.st_size}.json"
+
+
+def _read_yaml(path: Path) -> Dict[str, Any]:
+    # читаем файл целиком одним read() и отдаём парсеру bytes:
+    # libyaml сам декодирует UTF-8, без потокового чтения и лишнего прохода кодека
+    with open(path, "rb") as f:
+        buf = f.read()
+    return yaml.load(buf, Loader=_YamlLoader)
+
+
+def _write_config_cache(path: Path, cache: Path, raw: Dict[str, Any]) -> None:
+    """
+    Сохраняет распарсенный конфиг в JSON.
+
+    Кэш — чистая оптимизация, поэтому любые проблемы (нет прав на запись,
+    в YAML есть значения, которые не сериализуются в JSON, например даты
+    без кавычек) просто означают "без кэша", а не падение запуска.
+    """
+    try:
+        payload = json.dumps(raw)
+    except (TypeError, ValueError):
+        return
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        # старые версии кэша этого же файла больше не нужны
+        for stale in cache.parent.glob(f"{path.name}.*_*.json"):
+            stale.unlink(missing_ok=True)
+        tmp = cache.with_suffix(".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, cache)
+    except OSError:
+        pass
+
+
+def _parse_config(path: Path, st: os.stat_result | None) -> RunConfig:
+    """
+    Собственно чтение конфига (JSON-кэш или YAML) -> RunConfig.
+
+    st=None означает "без on-disk кэша": всегда парсим YAML.
+    """
+    raw = None
+
+    if st is not None:
+        cache = _config_cache_path(path, st)
+        try:
+            with open(cache, "rb") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            raw = None
+
+    if raw is None:
+        raw = _read_yaml(path)
+        if st is not None:
+            _write_config_cache(path, cache, raw)
+
+    return RunConfig(
+        data=MappingProxyType(dict(raw.get("data", {}))),
+        strategy=MappingProxyType(dict(raw.get("strategy", {}))),
+        execution=MappingProxyType(dict(raw.get("execution", {}))),
+        initial_cash=float(raw.get("initial_cash", 10_000.0)),
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _load_config_memo(path: str, mtime_ns: int, size: int) -> RunConfig:
+    # mtime/size входят в ключ: если файл поменяли, получим новый RunConfig
+    return _parse_config(Path(path), os.stat(path))
+
+
+def load_config(path: str | Path, use_cache: bool = True) -> RunConfig:
     """
     Читает YAML и превращает его в RunConfig.
 
     Важный момент:
     - мы не пытаемся сейчас валидировать всё строго (это можно добавить позже)
     - но мы уже делаем "нормализацию": гарантируем, что нужные секции существуют
+
+    Кэш (двухуровневый):
+    - in-process: повторный вызов с тем же (абсолютным) путём в рамках одного
+      процесса возвращает уже готовый RunConfig (lru_cache; ключ — путь+mtime+size)
+    - on-disk: после первого парсинга сырой dict сохраняется в `<dir>/.cache/*.json`;
+      при следующем запуске, если mtime+size файла не изменились, читаем JSON
+      (он парсится заметно быстрее YAML)
+    - use_cache=False (CLI: --no-config-cache) — всегда парсим YAML заново
+    - load_config.cache_clear() — сбросить in-process кэш
     """
-    with open(path, "r", encoding="utf-8") as f:
-        raw = yaml.safe_load(f)
+    path = Path(path).resolve()
+    if not use_cache:
+        return _parse_config(path, None)
 
-    return RunConfig(
-        data=raw.get("data", {}),
-        strategy=raw.get("strategy", {}),
-        execution=raw.get("execution", {}),
-        initial_cash=float(raw.get("initial_cash", 10_000.0)),
-    )
+    st = os.stat(path)
+    return _load_config_memo(str(path), st.st_mtime_ns, st.st_size)
+
+
+load_config.cache_clear = _load_config_memo.cache_clear
 
 
 def build_data_source(cfg: RunConfig):
@@ -103,6 +209,8 @@ def build_strategy(cfg: RunConfig):
         # чтобы:
         # - было легче логировать/сохранять параметры
         # - было легче делать новые стратегии с похожим паттерном
+        # приводим типы на границе: в YAML, написанном руками, бывает "fast: 10.0"
+        # или строка в кавычках; argparse типизирует только CLI-оверрайды
         params = SMACrossParams(
             fast=int(cfg.strategy.get("fast", 10)),
             slow=int(cfg.strategy.get("slow", 40)),
@@ -136,12 +244,49 @@ def build_execution(cfg: RunConfig):
             fee_bps=float(cfg.execution.get("fee_bps", 1.0)),
             slippage_bps=float(cfg.execution.get("slippage_bps", 1.0)),
             fill_price=str(cfg.execution.get("fill_price", "open")),
+            precision=str(cfg.execution.get("precision", "f64")),
         )
         return NextBarExecutionModel(params=params)
 
     raise ValueError(f"Unknown execution.kind: {kind}")
 
 
+# CLI-аргумент -> (секция RunConfig, ключ в секции)
+_CLI_OVERRIDES = {
+    "symbol": ("data", "symbol"),
+    "start": ("data", "start"),
+    "end": ("data", "end"),
+    "fast": ("strategy", "fast"),
+    "slow": ("strategy", "slow"),
+    "fee_bps": ("execution", "fee_bps"),
+    "slippage_bps": ("execution", "slippage_bps"),
+}
+
+
+def apply_cli_overrides(cfg: RunConfig, args: argparse.Namespace) -> RunConfig:
+    """
+    Накладывает явно заданные CLI-параметры поверх YAML-конфига.
+
+    - None означает "не задано" — остаётся значение из YAML
+    - значения уже типизированы argparse (type=float/int), повторно не приводим
+    - cfg не мутируется (секции read-only), возвращается новый RunConfig
+    """
+    sections: Dict[str, Dict[str, Any]] = {}
+    for arg, (section, key) in _CLI_OVERRIDES.items():
+        value = getattr(args, arg, None)
+        if value is None:
+            continue
+        if section not in sections:
+            sections[section] = dict(getattr(cfg, section))
+        sections[section][key] = value
+
+    changes: Dict[str, Any] = {k: MappingProxyType(v) for k, v in sections.items()}
+    if getattr(args, "initial_cash", None) is not None:
+        changes["initial_cash"] = args.initial_cash
+
+    return replace(cfg, **changes) if changes else cfg
+
+
 def main():
     """
     Точка входа.
@@ -161,9 +306,27 @@ def main():
     """
     ap = argparse.ArgumentParser()
     ap.add_argument("--config", required=True, help="Path to YAML config")
+    ap.add_argument(
+        "--no-config-cache",
+        action="store_true",
+        help="Always re-parse YAML (ignore/skip the .cache/*.json config cache)",
+    )
+
+    # Оверрайды поверх YAML (по умолчанию None = берём из конфига)
+    ap.add_argument("--symbol", type=str, default=None, help="Override data.symbol")
+    ap.add_argument("--start", type=str, default=None, help="Override data.start (YYYY-MM-DD)")
+    ap.add_argument("--end", type=str, default=None, help="Override data.end (YYYY-MM-DD)")
+    ap.add_argument("--initial-cash", type=float, default=None, help="Override initial_cash")
+    ap.add_argument("--fast", type=int, default=None, help="Override strategy.fast")
+    ap.add_argument("--slow", type=int, default=None, help="Override strategy.slow")
+    ap.add_argument("--fee-bps", type=float, default=None, help="Override execution.fee_bps")
+    ap.add_argument("--slippage-bps", type=float, default=None, help="Override execution.slippage_bps")
     args = ap.parse_args()
 
-    cfg = load_config(args.config)
+    if args.no_config_cache:
+        load_config.cache_clear()
+    cfg = load_config(args.config, use_cache=not args.no_config_cache)
+    cfg = apply_cli_overrides(cfg, args)
 
     # 1) выбираем источник данных
     data_source = build_data_source(cfg)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
 from toy_trader.data_sources import YahooDataSource
@@ -50,7 +51,9 @@ def main() -> None:
     res = engine.run()
     
     # A1.1 sanity: cash should not go meaningfully negative (spot, no margin)
-    min_cash = min(s.cash for s in res.states)
+    # (читаем массивы истории напрямую, без сборки PortfolioState на каждый бар)
+    soa = res.states_soa()
+    min_cash = float(soa["cash"].min())
     assert min_cash >= -1e-6, f"cash went negative: min_cash={min_cash}"
     
     symbol = res.market_data.symbol
@@ -59,11 +62,7 @@ def main() -> None:
 
     assert len(res.states) == len(res.market_data.bars)
     assert all(isinstance(f.qty, float) for f in res.fills)
-    assert all(
-        isinstance(q, float)
-        for s in res.states
-        for q in s.positions.values()
-    )
+    assert all(np.issubdtype(arr.dtype, np.floating) for arr in soa["positions"].values())
 
     print(f"symbol={symbol}, start={start}")
     print(f"bars={len(res.market_data.bars)}, fills={len(res.fills)}, states={len(res.states)}")
@@ -73,7 +72,7 @@ def main() -> None:
         eq = equity_curve(res)
     else:
         idx = res.market_data.bars.index
-        eq = pd.Series([s.equity for s in res.states], index=idx, name="equity")
+        eq = pd.Series(soa["equity"], index=idx, name="equity", copy=False)
         
     if drawdown_curve is not None:
         dd = drawdown_curve(eq)
@@ -107,35 +106,43 @@ def main() -> None:
     # --- 7) Графики
     import matplotlib.pyplot as plt
 
-    plt.figure(figsize=(11, 5))
-    plt.plot(price, label="Price (Close)")
-    plt.plot(position * price.max() * 0.05, label="Position (scaled)")  # маленькая полоска-индикатор
-    plt.legend()
-    plt.title(f"{symbol} price and position")
-    plt.show()
+    # Один Figure на все панели: один canvas вместо четырёх отдельных окон
+    n_panels = 4 if dd is not None else 3
+    heights = [5, 5, 4, 3][:n_panels]
+    fig, axes = plt.subplots(
+        n_panels, 1,
+        figsize=(11, sum(heights)),
+        sharex=True,
+        gridspec_kw={"height_ratios": heights},
+    )
 
-    plt.figure(figsize=(11, 5))
-    plt.plot(pnl_strategy, label="Strategy PnL ($)")
-    plt.plot(pnl_buyhold, label="Buy&Hold all-in PnL ($)")
-    plt.axhline(0.0)
-    plt.legend()
-    plt.title(f"{symbol}: PnL comparison (correct for 1-unit sizing)")
-    plt.show()
-    
-    plt.figure(figsize=(11, 4))
-    plt.plot(eq, label="Equity ($)")
-    plt.legend()
-    plt.title(f"{symbol}: Equity curve")
-    plt.show()
+    ax = axes[0]
+    ax.plot(price, label="Price (Close)")
+    ax.plot(position * price.max() * 0.05, label="Position (scaled)")  # маленькая полоска-индикатор
+    ax.legend()
+    ax.set_title(f"{symbol} price and position")
+
+    ax = axes[1]
+    ax.plot(pnl_strategy, label="Strategy PnL ($)")
+    ax.plot(pnl_buyhold, label="Buy&Hold all-in PnL ($)")
+    ax.axhline(0.0)
+    ax.legend()
+    ax.set_title(f"{symbol}: PnL comparison (correct for 1-unit sizing)")
+
+    ax = axes[2]
+    ax.plot(eq, label="Equity ($)")
+    ax.legend()
+    ax.set_title(f"{symbol}: Equity curve")
 
     if dd is not None:
-        plt.figure(figsize=(11, 3))
-        plt.plot(dd, label="Drawdown")
-        plt.axhline(0.0)
-        plt.legend()
-        plt.title(f"{symbol}: Drawdown")
-        plt.show()
+        ax = axes[3]
+        ax.plot(dd, label="Drawdown")
+        ax.axhline(0.0)
+        ax.legend()
+        ax.set_title(f"{symbol}: Drawdown")
 
+    fig.tight_layout()
+    plt.show()
 
 if __name__ == "__main__":
     main()
@@ -36,8 +36,9 @@ def main() -> None:
 
     idx = res.market_data.index
 
-    # 1) Equity curve from states
-    eq = pd.Series([s.equity for s in res.states], index=idx, name="equity").astype(float)
+    # 1) Equity curve from states (SoA arrays, no per-state Python loop)
+    soa = res.states_soa()
+    eq = pd.Series(soa["equity"], index=idx, name="equity", copy=False)
 
     # 2) Metrics
     m = metrics_from_equity(eq)
@@ -50,32 +51,32 @@ def main() -> None:
     print(f"  max_drawdown: {m.max_drawdown:.4f}")
 
     # 3) Per-symbol qty series
-    qty_df = pd.DataFrame(
-        {sym: [st.positions.get(sym, 0.0) for st in res.states] for sym in res.market_data.symbols},
-        index=idx,
-    )
-
-    # 4) Plots
-    plt.figure(figsize=(12, 4))
-    plt.plot(eq, label="Equity ($)")
-    plt.title(f"Multi-asset equity ({', '.join(symbols)})")
-    plt.legend()
-    plt.show()
-
-    if drawdown_curve is not None:
-        dd = drawdown_curve(eq)
-        plt.figure(figsize=(12, 3))
-        plt.plot(dd, label="Drawdown")
-        plt.axhline(0.0)
-        plt.title("Drawdown")
-        plt.legend()
-        plt.show()
-
-    plt.figure(figsize=(12, 4))
-    for sym in qty_df.columns:
-        plt.plot(qty_df[sym], label=f"{sym} qty")
-    plt.title("Position quantities (per symbol)")
-    plt.legend()
+    qty_df = pd.DataFrame(soa["positions"], index=idx, copy=False)
+
+    # 4) Plots: один Figure, все панели в нём
+    dd = drawdown_curve(eq) if drawdown_curve is not None else None
+    n_panels = 3 if dd is not None else 2
+    fig, axes = plt.subplots(n_panels, 1, figsize=(12, 4 * n_panels), sharex=True)
+
+    ax = axes[0]
+    ax.plot(eq, label="Equity ($)")
+    ax.set_title(f"Multi-asset equity ({', '.join(symbols)})")
+    ax.legend()
+
+    if dd is not None:
+        ax = axes[1]
+        ax.plot(dd, label="Drawdown")
+        ax.axhline(0.0)
+        ax.set_title("Drawdown")
+        ax.legend()
+
+    # все символы одним вызовом: matplotlib рисует по линии на колонку
+    ax = axes[-1]
+    ax.plot(qty_df.index, qty_df.to_numpy())
+    ax.set_title("Position quantities (per symbol)")
+    ax.legend([f"{sym} qty" for sym in qty_df.columns])
+
+    fig.tight_layout()
     plt.show()
 
     print(f"bars={len(idx)}, fills={len(res.fills)}, states={len(res.states)}")
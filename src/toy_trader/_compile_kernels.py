@@ -0,0 +1,48 @@
+"""
+AOT-сборка njit-ядер стратегий в расширение toy_trader._kernels (numba.pycc).
+
+Зачем: на коротких прогонах время JIT-компиляции при первом вызове заметно
+больше самого расчёта. Собранное расширение подхватывается через _njit.aot —
+на импорте ничего не компилируется, арифметика та же (fastmath выключен).
+
+Запуск (один раз на окружение, после изменения ядер — пересобрать):
+    python -m toy_trader._compile_kernels
+
+Что не экспортируем:
+- ядра с error_model="numpy" (_rsi_nb): pycc компилирует с Python error model,
+  деление на 0 там бросило бы исключение вместо inf/NaN;
+- parallel-ядра (_zscore_grid_nb): pycc не поддерживает parallel=True.
+"""
+
+from __future__ import annotations
+
+import os
+
+from numba.pycc import CC
+
+from . import strategies as S
+
+# имя ядра -> сигнатура (массивы float64 1-D, окна/сдвиги int64, позиции int8)
+KERNELS = {
+    "_rolling_mean_nb": "f8[:](f8[:], i8)",
+    "_rolling_mean_std": "UniTuple(f8[:], 2)(f8[:], i8)",
+    "_sma_cross_loop": "f8[:](f8[:], i8, i8, i8)",
+    "_zscore_loop": "i1[:](f8[:], f8, f8)",
+    "_rsi_loop": "i1[:](f8[:], f8, f8)",
+    "_rolling_extreme_shift1": "f8[:](f8[:], i8, b1)",
+    "_donchian_loop": "i1[:](f8[:], f8[:], f8[:])",
+}
+
+
+def build_cc() -> CC:
+    cc = CC("_kernels")
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    for name, sig in KERNELS.items():
+        # экспортируем исходную Python-функцию; вложенные вызовы других ядер
+        # компилируются внутрь расширения
+        cc.export(name, sig)(getattr(S, name).py_func)
+    return cc
+
+
+if __name__ == "__main__":
+    build_cc().compile()
@@ -0,0 +1,56 @@
+"""
+Опциональный JIT через numba.
+
+Если numba установлена — реэкспортируем njit/prange как есть.
+Если нет — njit превращается в no-op декоратор (функция остаётся обычным
+Python-кодом), prange = range. Вызывающий код может смотреть на
+NUMBA_AVAILABLE и выбирать векторный NumPy-путь вместо скалярного цикла
+(NUMBA_DISABLE_JIT=1 тоже считается "numba нет").
+
+aot(kernel) — AOT-собранная версия ядра из расширения toy_trader._kernels
+(python -m toy_trader._compile_kernels), если оно собрано: без JIT-компиляции
+на первом вызове. Нет расширения или ядра в нём — возвращается сам njit-kernel.
+"""
+
+from __future__ import annotations
+
+try:
+    from numba import config as _numba_config
+    from numba import njit, prange
+
+    NUMBA_AVAILABLE = not _numba_config.DISABLE_JIT
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    prange = range
+
+    def njit(*args, **kwargs):
+        # поддерживаем обе формы: @njit и @njit(cache=True, ...)
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def deco(fn):
+            return fn
+
+        return deco
+
+try:
+    from . import _kernels as _aot_kernels
+except ImportError:
+    _aot_kernels = None
+
+
+def aot(kernel):
+    """
+    Точка входа в ядро из Python-кода: AOT-версия, если есть, иначе kernel.
+
+    Только для вызовов из Python — внутри других njit-ядер зовём сам kernel
+    (numba не умеет вызывать AOT-функции). При выключенном JIT AOT не берём,
+    чтобы NUMBA_DISABLE_JIT=1 по-прежнему давал отлаживаемый Python-код.
+    """
+    if _aot_kernels is None or not NUMBA_AVAILABLE:
+        return kernel
+    return getattr(_aot_kernels, kernel.__name__, kernel)
+
+
+__all__ = ["njit", "prange", "aot", "NUMBA_AVAILABLE"]
@@ -2,7 +2,12 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_INF = float("inf")
 
 
 # ============================
@@ -21,25 +26,146 @@ def _clean_long_only(raw: Dict[str, float]) -> Dict[str, float]:
     - стратегии могут быть кривыми / экспериментальными
     - allocation НЕ должен падать из-за одной стратегии
     """
-    out: Dict[str, float] = {}
-    for k, v in raw.items():
-        try:
-            x = float(v)
-        except Exception:
-            x = 0.0
+    keys, vals = _clean_long_only_array(raw)
+    return dict(zip(keys, vals.tolist()))
+
 
-        # NaN check (NaN != NaN)
-        if x != x:
-            x = 0.0
+def _clean_long_only_array(raw: Dict[str, float]) -> Tuple[List[str], np.ndarray]:
+    """
+    То же, что _clean_long_only, но результат — (keys, float64-массив в порядке keys).
+
+    Аллокаторы дальше работают с массивом целиком и собирают dict один раз в конце.
+    """
+    keys = list(raw)
+    try:
+        vals = np.fromiter((raw[k] for k in keys), dtype=np.float64, count=len(keys))
+    except (TypeError, ValueError):
+        # в raw есть что-то, что не приводится к float (строка, None, ...) —
+        # редкий случай, разбираем поэлементно
+        clean = _clean_long_only_slow(raw)
+        return keys, np.fromiter(clean.values(), dtype=np.float64, count=len(keys))
+
+    # NaN/inf -> 0, long-only: всё отрицательное обнуляем
+    np.nan_to_num(vals, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    np.maximum(vals, 0.0, out=vals)
+    return keys, vals
+
+
+def _clean_long_only_matrix(raw: pd.DataFrame) -> Optional[np.ndarray]:
+    """
+    Очистка сразу всей матрицы сигналов [T, N] (та же семантика, что у
+    _clean_long_only). None — если в матрице есть не-числа: тогда вызывающий
+    код идёт построчно через allocate().
+    """
+    try:
+        vals = raw.to_numpy(dtype=np.float64, copy=True)
+    except (TypeError, ValueError):
+        return None
+    np.nan_to_num(vals, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    np.maximum(vals, 0.0, out=vals)
+    return vals
 
-        # long-only: всё отрицательное обнуляем
-        if x < 0.0:
-            x = 0.0
+
+def _clean_long_only_slow(raw: Dict[str, float]) -> Dict[str, float]:
+    """
+    Поэлементный вариант _clean_long_only для "грязного" входа.
+
+    Семантика та же, что у векторного пути: мусор/NaN/inf/отрицательное -> 0.
+
+    Обычные float/int разбираем проверкой типа и одним сравнением
+    `0 < x < inf` (NaN его не проходит), без try/except: исключение в CPython
+    на порядки дороже. try/except остаётся только для прочих типов (строки и т.п.).
+    """
+    out: Dict[str, float] = {}
+    for k, v in raw.items():
+        t = type(v)
+        if t is float:
+            x = v if 0.0 < v < _INF else 0.0
+        elif t is int:
+            x = float(v) if v > 0 else 0.0
+        else:
+            try:
+                x = float(v)
+            except Exception:
+                x = 0.0
+            # NaN/inf/отрицательное -> 0 (long-only)
+            if not (0.0 < x < _INF):
+                x = 0.0
 
         out[k] = x
     return out
 
 
+def _water_fill(w: np.ndarray, cap: float, budget: float, eps: float) -> np.ndarray:
+    """
+    Water-filling над массивом весов (w >= 0), решение в замкнутой форме.
+
+    Итеративная процедура "режем по cap -> раздаём остаток пропорционально
+    тем, кто ещё не упёрся в cap" сходится к
+        w_i = min(cap, lam * w_i)   для ещё не упёртых активов,
+    где lam подбирается так, чтобы сумма стала = budget. Такой lam находится
+    одним проходом по отсортированным весам: перебираем k = сколько самых
+    больших весов упрётся в cap, и берём минимальное k, при котором
+    (k+1)-й вес после масштабирования ещё <= cap.
+
+    Если даже все положительные веса упёрлись в cap, а бюджет остался —
+    остаток делится поровну между нулевыми весами (тоже с cap), как делал
+    исходный итеративный алгоритм.
+
+    Быстрый выход (типичный случай — cap не связывает): если ни один вес
+    не превышает cap и бюджет уже выбран, перераспределять нечего — O(N).
+    Условия "cap * N >= budget" для этого НЕ достаточно: при недобранном
+    бюджете остаток раздаётся и нулевым весам.
+    """
+    if budget <= eps:
+        return np.zeros_like(w)
+
+    s = float(w.sum())
+    if s >= budget - eps and (len(w) == 0 or float(w.max()) <= cap):
+        if s > budget + eps:
+            w = w * (budget / s)
+        return w
+
+    w = np.minimum(w, cap)
+
+    s = float(w.sum())
+    if s < budget - eps:
+        # активы, которые ещё можно увеличивать
+        eligible = w < cap - eps
+        if eligible.any():
+            rest = budget - float(w[~eligible].sum())
+            base = float(w[eligible].sum())
+
+            if base <= eps:
+                # все eligible почти 0 — делим поровну
+                w[eligible] = np.minimum(cap, w[eligible] + rest / int(eligible.sum()))
+            else:
+                pos = eligible & (w > 0.0)
+                a = np.sort(w[pos])[::-1]
+                # tail[k] = сумма весов, которые НЕ упрутся в cap при k упёртых
+                tail = np.cumsum(a[::-1])[::-1]
+                k_range = np.arange(len(a))
+                lam = (rest - k_range * cap) / tail
+                ok = np.flatnonzero(lam * a <= cap)
+
+                if len(ok):
+                    w[pos] = np.minimum(cap, lam[ok[0]] * w[pos])
+                else:
+                    # все положительные упёрлись в cap — остаток нулевым поровну
+                    w[pos] = cap
+                    zeros = eligible & ~pos
+                    leftover = rest - cap * len(a)
+                    if leftover > eps and zeros.any():
+                        w[zeros] = min(cap, leftover / int(zeros.sum()))
+
+    # финальная защита от численных ошибок
+    s = float(w.sum())
+    if s > budget + eps:
+        w *= budget / s
+
+    return w
+
+
 def _cap_and_redistribute(
     weights: Dict[str, float],
     cap: float,
@@ -52,9 +178,9 @@ def _cap_and_redistribute(
     Это классический water-filling:
     - сначала режем всё по cap
     - если после этого сумма < budget, перераспределяем остаток
-    - делаем это итеративно, пока:
-        * не исчерпаем budget
-        * или не упремся во все cap'ы
+      пропорционально тем, кто ещё не упёрся в cap
+    - пока не исчерпаем budget или не упремся во все cap'ы
+    (решается сразу в замкнутой форме, см. _water_fill)
 
     ВАЖНО:
     - deterministic
@@ -65,53 +191,10 @@ def _cap_and_redistribute(
         # если cap = 0 → всё запрещено
         return {k: 0.0 for k in weights}
 
-    # старт: просто применяем cap
-    w = {k: min(float(v), cap) for k, v in weights.items()}
-
-    for _ in range(10_000):  # защита от бесконечных циклов
-        s = sum(w.values())
-        if s >= budget - eps:
-            break
-
-        leftover = budget - s
-
-        # активы, которые ещё можно увеличивать
-        eligible = [k for k, v in w.items() if v < cap - eps]
-        if not eligible:
-            break
-
-        base = sum(w[k] for k in eligible)
-
-        # если все eligible были почти 0 — делим поровну
-        if base <= eps:
-            add_each = leftover / len(eligible)
-            changed = False
-            for k in eligible:
-                new_v = min(cap, w[k] + add_each)
-                if abs(new_v - w[k]) > eps:
-                    changed = True
-                w[k] = new_v
-            if not changed:
-                break
-        else:
-            # пропорциональное перераспределение
-            changed = False
-            for k in eligible:
-                add = leftover * (w[k] / base)
-                new_v = min(cap, w[k] + add)
-                if abs(new_v - w[k]) > eps:
-                    changed = True
-                w[k] = new_v
-            if not changed:
-                break
-
-    # финальная защита от численных ошибок
-    s = sum(w.values())
-    if s > budget + eps:
-        scale = budget / s
-        w = {k: v * scale for k, v in w.items()}
-
-    return w
+    keys = list(weights)
+    w = np.fromiter((weights[k] for k in keys), dtype=np.float64, count=len(keys))
+    w = _water_fill(w, cap=cap, budget=budget, eps=eps)
+    return dict(zip(keys, w.tolist()))
 
 
 # ============================
@@ -130,6 +213,9 @@ class AllocationModel(ABC):
         * sum(w) <= budget
     """
 
+    # пустые slots: иначе у slots-наследников всё равно появится __dict__
+    __slots__ = ()
+
     @abstractmethod
     def allocate(
         self,
@@ -138,12 +224,49 @@ class AllocationModel(ABC):
     ) -> Dict[str, float]:
         raise NotImplementedError
 
+    def allocate_batch(self, raw: pd.DataFrame, budget: float = 1.0) -> pd.DataFrame:
+        """
+        allocate() сразу для всей истории.
+
+        raw: DataFrame [T, N] — строки = бары, колонки = символы.
+        Возвращает DataFrame весов той же формы. Базовая реализация
+        просто зовёт allocate() построчно; наследники переопределяют
+        её векторным вариантом с той же семантикой.
+        """
+        cols = list(raw.columns)
+        out = np.zeros(raw.shape, dtype=np.float64)
+        for t, row in enumerate(raw.itertuples(index=False, name=None)):
+            w = self.allocate(dict(zip(cols, row)), budget=budget)
+            out[t] = [float(w.get(c, 0.0)) for c in cols]
+        return pd.DataFrame(out, index=raw.index, columns=raw.columns)
+
+
+def _apply_cap_rows(w: np.ndarray, rows: np.ndarray, cap: float, budget: float, eps: float) -> None:
+    """
+    cap для матрицы весов [T, N] in-place, только по строкам из маски rows
+    (пустые строки остаются нулевыми — как ранний выход в allocate()).
+
+    Строки, где cap не связывает, проходят только защиту sum <= budget
+    (как быстрый выход _water_fill), остальные — через _water_fill по одной.
+    """
+    if budget <= eps:
+        w[:] = 0.0
+        return
+    s = w.sum(axis=1)
+    fast = (s >= budget - eps) & (w.max(axis=1, initial=0.0) <= cap)
+    slow = rows & ~fast
+    over = rows & fast & (s > budget + eps)
+    if over.any():
+        w[over] *= (budget / s[over])[:, None]
+    for t in np.flatnonzero(slow):
+        w[t] = _water_fill(w[t], cap=cap, budget=budget, eps=eps)
+
 
 # ============================
 # РЕАЛИЗАЦИИ
 # ============================
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ProportionalAllocator(AllocationModel):
     """
     ДЕФОЛТНЫЙ аллокатор.
@@ -156,6 +279,11 @@ class ProportionalAllocator(AllocationModel):
     Пример:
         raw = {A: 1, B: 2}
         → w = {A: 0.333, B: 0.666}
+
+    Реализация: этот аллокатор вызывается на каждом баре с одним и тем же
+    набором символов, поэтому весь путь (очистка -> нормализация -> cap)
+    идёт по одному float64-массиву, а dict собирается один раз на выходе —
+    без промежуточных dict'ов между шагами.
     """
 
     cap: Optional[float] = None   # max weight per asset
@@ -166,35 +294,66 @@ class ProportionalAllocator(AllocationModel):
         if budget <= 0.0:
             return {k: 0.0 for k in raw}
 
-        clean = _clean_long_only(raw)
-        s = sum(clean.values())
+        keys, w = _clean_long_only_array(raw)
+        s = float(w.sum())
 
         # если никто не хочет в рынок — остаёмся в кэше
         if s <= self.eps:
-            return {k: 0.0 for k in clean}
+            return dict.fromkeys(keys, 0.0)
 
-        # пропорциональная нормализация
-        w = {k: (v / s) * budget for k, v in clean.items()}
+        # пропорциональная нормализация (in-place)
+        w /= s
+        w *= budget
 
         # опционально применяем cap
         if self.cap is not None:
-            w = _cap_and_redistribute(
-                w,
-                cap=float(self.cap),
-                budget=budget,
-                eps=self.eps,
-            )
+            cap = float(self.cap)
+            if cap <= 0.0:
+                # если cap = 0 → всё запрещено
+                return dict.fromkeys(keys, 0.0)
+            w = _water_fill(w, cap=cap, budget=budget, eps=self.eps)
         else:
             # чисто числовая защита
-            sw = sum(w.values())
+            sw = float(w.sum())
             if sw > budget + self.eps:
-                scale = budget / sw
-                w = {k: v * scale for k, v in w.items()}
+                w *= budget / sw
 
-        return w
+        return dict(zip(keys, w.tolist()))
+
+    def allocate_batch(self, raw: pd.DataFrame, budget: float = 1.0) -> pd.DataFrame:
+        """
+        Векторная версия allocate() по всей матрице [T, N]:
+        очистка -> нормализация строк -> cap (water-filling только там, где он связывает).
+        """
+        budget = float(budget)
+        w = _clean_long_only_matrix(raw)
+        if w is None:
+            return AllocationModel.allocate_batch(self, raw, budget=budget)
+
+        if budget <= 0.0 or (self.cap is not None and float(self.cap) <= 0.0):
+            w[:] = 0.0
+            return pd.DataFrame(w, index=raw.index, columns=raw.columns)
+
+        s = w.sum(axis=1)
+        # строки, где никто не хочет в рынок — остаются в кэше
+        flat = s <= self.eps
+        s[flat] = 1.0
+        w /= s[:, None]
+        w *= budget
+        w[flat] = 0.0
+
+        if self.cap is not None:
+            _apply_cap_rows(w, ~flat, cap=float(self.cap), budget=budget, eps=self.eps)
+        else:
+            sw = w.sum(axis=1)
+            over = sw > budget + self.eps
+            if over.any():
+                w[over] *= (budget / sw[over])[:, None]
+
+        return pd.DataFrame(w, index=raw.index, columns=raw.columns)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EqualWeightAllocator(AllocationModel):
     """
     Equal-weight по активным стратегиям.
@@ -230,3 +389,31 @@ class EqualWeightAllocator(AllocationModel):
             )
 
         return w
+
+    def allocate_batch(self, raw: pd.DataFrame, budget: float = 1.0) -> pd.DataFrame:
+        """Векторная версия allocate(): budget / N_active на каждой строке, затем cap."""
+        budget = float(budget)
+        clean = _clean_long_only_matrix(raw)
+        if clean is None:
+            return AllocationModel.allocate_batch(self, raw, budget=budget)
+
+        w = np.zeros_like(clean)
+        if budget <= 0.0:
+            return pd.DataFrame(w, index=raw.index, columns=raw.columns)
+
+        active = clean > self.eps
+        n_active = active.sum(axis=1)
+        rows = n_active > 0
+        w0 = np.zeros(len(w))
+        w0[rows] = budget / n_active[rows]
+        np.copyto(w, w0[:, None], where=active)
+
+        if self.cap is not None:
+            cap = float(self.cap)
+            if cap <= 0.0:
+                # если cap = 0 → всё запрещено
+                w[:] = 0.0
+            else:
+                _apply_cap_rows(w, rows, cap=cap, budget=budget, eps=self.eps)
+
+        return pd.DataFrame(w, index=raw.index, columns=raw.columns)
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict
+from functools import cached_property
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Union, overload
+import numpy as np
 import pandas as pd
 
 # ---- numeric aliases (MVP uses float) ----
@@ -24,6 +26,68 @@ class MarketData:
     bars: pd.DataFrame
     symbol: str
 
+    @cached_property
+    def arrays(self) -> MarketArrays:
+        """
+        Колоночный вид баров (SoA): Close/High/Low как float64-массивы.
+
+        Строится один раз на MarketData — все стратегии, запущенные на одних
+        данных, берут готовые массивы вместо своего bars["Close"].astype(float).
+        Предполагается, что bars после создания MarketData не меняются.
+        """
+        return MarketArrays(self.bars)
+
+
+@dataclass(frozen=True)
+class MarketArrays:
+    """
+    Бары как набор непрерывных float64-массивов (только чтение) + общий индекс.
+
+    Колонка превращается в массив при первом обращении и дальше переиспользуется
+    (нет колонки в bars — KeyError, как и у bars[...]). Series из массивов
+    собираются без копий (close_series) только там, где расчёт идёт через pandas.
+
+    cache — мемоизация индикаторов по ключу вида (op, column, window): несколько
+    стратегий на тех же барах не пересчитывают одно и то же rolling-окно.
+    """
+    bars: pd.DataFrame
+    cache: Dict[Hashable, np.ndarray] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def index(self) -> pd.Index:
+        return self.bars.index
+
+    @cached_property
+    def close(self) -> np.ndarray:
+        return self._column("Close")
+
+    @cached_property
+    def high(self) -> np.ndarray:
+        return self._column("High")
+
+    @cached_property
+    def low(self) -> np.ndarray:
+        return self._column("Low")
+
+    def _column(self, name: str) -> np.ndarray:
+        arr = np.ascontiguousarray(self.bars[name].to_numpy(dtype=np.float64))
+        if arr.flags.writeable:
+            arr.flags.writeable = False  # массив общий для всех стратегий
+        return arr
+
+    def memo(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Индикатор из cache или compute() один раз (результат только для чтения)."""
+        arr = self.cache.get(key)
+        if arr is None:
+            arr = compute()
+            arr.flags.writeable = False
+            self.cache[key] = arr
+        return arr
+
+    def close_series(self) -> pd.Series:
+        """Close как Series (view на массив), как bars["Close"].astype(float)."""
+        return pd.Series(self.close, index=self.index, name="Close", copy=False)
+
 
 @dataclass(frozen=True)
 class Signals:
@@ -69,8 +133,257 @@ class PortfolioState:
     - positions: symbol -> qty (qty может быть <0 для short; пока не используем)
     - last_prices: symbol -> price (для mark-to-market)
     - equity: cash + sum(qty_i * price_i)
+
+    Опционально (заполняет execution, когда набор символов известен заранее):
+    - positions_arr: qty в плотном виде, positions_arr[symbol_idx[sym]]
+    - symbol_idx: symbol -> позиция в positions_arr; ОДИН общий dict
+      на все снимки прогона (не копируется на каждом баре)
     """
     cash: float
     positions: Dict[str, Qty] = field(default_factory=dict)
     last_prices: Dict[str, Price] = field(default_factory=dict)
     equity: Equity = 0.0
+    positions_arr: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    symbol_idx: Optional[Dict[str, int]] = field(default=None, repr=False, compare=False)
+
+
+def portfolio_soa(states: Sequence[PortfolioState], symbols: Sequence[str]) -> Dict[str, Any]:
+    """
+    Переворачивает список снимков PortfolioState (AoS) в набор массивов (SoA).
+
+    Возвращает:
+    - equity:    np.ndarray[T]
+    - cash:      np.ndarray[T]
+    - positions: dict symbol -> np.ndarray[T] (qty; 0.0, если позиции нет)
+
+    Зачем:
+    - отчёты строят Series/DataFrame по всей истории; из готовых массивов
+      это делается без копии и без N_bars x N_symbols dict-lookup'ов в Python
+    - буферы выделяются один раз, заполняются одним проходом по states
+    - если все снимки несут positions_arr с общим symbol_idx, позиции
+      собираются одним np.stack вместо N_bars x N_symbols dict-lookup'ов
+    """
+    if isinstance(states, PortfolioHistory):
+        return states.soa(symbols)
+
+    n = len(states)
+    equity = np.empty(n, dtype=np.float64)
+    cash = np.empty(n, dtype=np.float64)
+
+    symbol_idx = states[0].symbol_idx if n else None
+    if symbol_idx is not None and all(
+        st.symbol_idx is symbol_idx and st.positions_arr is not None for st in states
+    ):
+        mat = np.stack([st.positions_arr for st in states])
+        for i, st in enumerate(states):
+            equity[i] = st.equity
+            cash[i] = st.cash
+        positions = {
+            sym: (mat[:, symbol_idx[sym]] if sym in symbol_idx else np.zeros(n, dtype=np.float64))
+            for sym in symbols
+        }
+        return {"equity": equity, "cash": cash, "positions": positions}
+
+    positions: Dict[str, np.ndarray] = {sym: np.zeros(n, dtype=np.float64) for sym in symbols}
+
+    for i, st in enumerate(states):
+        equity[i] = st.equity
+        cash[i] = st.cash
+        for sym, qty in st.positions.items():
+            arr = positions.get(sym)
+            if arr is not None:
+                arr[i] = qty
+
+    return {"equity": equity, "cash": cash, "positions": positions}
+
+
+class PortfolioHistory(Sequence[PortfolioState]):
+    """
+    История портфеля по барам в колоночном виде (SoA).
+
+    Execution пишет сюда массивы вместо списка PortfolioState:
+    - cash:        np.ndarray[T]
+    - positions:   np.ndarray[T, S] (qty; 0.0 = позиции нет)
+    - last_prices: np.ndarray[T, S] (NaN = цены ещё нет)
+    - equity:      np.ndarray[T]
+    - symbols:     порядок колонок; symbol_idx[sym] -> номер колонки
+
+    Позиции/цены инструментов, которыми модель не торгует (пришли в
+    initial_state), не меняются по времени — хранятся один раз в base_*.
+
+    positions/last_prices могут быть float32 (ExecutionParams.precision="f32"),
+    cash/equity — всегда float64; снимок (as_state) отдаёт обычные float.
+
+    Снаружи это по-прежнему последовательность PortfolioState:
+    len(h), h[i], h[-1], for st in h — снимок собирается лениво, на запрос.
+    Полный список (для старого кода) — h.states, строится один раз.
+    """
+
+    def __init__(
+        self,
+        index: pd.Index,
+        symbols: Sequence[str],
+        cash: np.ndarray,
+        positions: np.ndarray,
+        last_prices: np.ndarray,
+        equity: np.ndarray,
+        base_positions: Optional[Dict[str, Qty]] = None,
+        base_prices: Optional[Dict[str, Price]] = None,
+    ):
+        self.index = index
+        self.symbols: List[str] = list(symbols)
+        self.symbol_idx: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.cash = cash
+        self.positions = positions
+        self.last_prices = last_prices
+        self.equity = equity
+        self.base_positions: Dict[str, Qty] = dict(base_positions or {})
+        self.base_prices: Dict[str, Price] = dict(base_prices or {})
+
+        n = len(cash)
+        if not (len(equity) == n and positions.shape == (n, len(self.symbols)) == last_prices.shape):
+            raise ValueError("PortfolioHistory: несовместимые размеры массивов")
+
+    def __len__(self) -> int:
+        return len(self.cash)
+
+    @overload
+    def __getitem__(self, i: int) -> PortfolioState: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[PortfolioState]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[PortfolioState, List[PortfolioState]]:
+        if isinstance(i, slice):
+            return [self.as_state(j) for j in range(*i.indices(len(self)))]
+        return self.as_state(i)
+
+    def __iter__(self) -> Iterator[PortfolioState]:
+        for j in range(len(self)):
+            yield self.as_state(j)
+
+    def as_state(self, i: int) -> PortfolioState:
+        """Снимок PortfolioState на баре i (поддерживаются отрицательные i)."""
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("PortfolioHistory index out of range")
+
+        pos_row = self.positions[i]
+        px_row = self.last_prices[i]
+
+        positions = dict(self.base_positions)
+        last_prices = dict(self.base_prices)
+        for sym, q, px in zip(self.symbols, pos_row.tolist(), px_row.tolist()):
+            if q != 0.0:
+                positions[sym] = q
+            if px == px:  # NaN -> цены нет
+                last_prices[sym] = px
+
+        return PortfolioState(
+            cash=float(self.cash[i]),
+            positions=positions,
+            last_prices=last_prices,
+            equity=float(self.equity[i]),
+            positions_arr=pos_row,
+            symbol_idx=self.symbol_idx,
+        )
+
+    @cached_property
+    def states(self) -> List[PortfolioState]:
+        """Список снимков для старого кода (строится один раз)."""
+        return [self.as_state(j) for j in range(len(self))]
+
+    def soa(self, symbols: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Тот же формат, что и portfolio_soa: equity[T], cash[T],
+        positions[symbol][T] — колонки отдаются view'ами, без копий.
+        """
+        syms = self.symbols if symbols is None else symbols
+        n = len(self)
+        positions: Dict[str, np.ndarray] = {}
+        for sym in syms:
+            j = self.symbol_idx.get(sym)
+            if j is not None:
+                positions[sym] = self.positions[:, j]
+            else:
+                positions[sym] = np.full(n, float(self.base_positions.get(sym, 0.0)))
+        return {"equity": self.equity, "cash": self.cash, "positions": positions}
+
+
+class FillHistory(Sequence[Fill]):
+    """
+    Сделки прогона в колоночном виде (SoA) — то, что выдаёт execution-ядро:
+    - bar_idx: np.ndarray[K] int64 — номер бара сделки в index
+    - sym_idx: np.ndarray[K] int64 — номер символа в symbols
+    - price, qty, fee: np.ndarray[K] float64
+
+    Снаружи — последовательность Fill: len(f), f[i], f[-1], for fill in f.
+    Fill-объекты собираются на запрос (len(fills) для num_trades их не создаёт);
+    timestamps берутся одним take по index при первом обращении.
+    """
+
+    def __init__(
+        self,
+        index: pd.Index,
+        symbols: Sequence[str],
+        bar_idx: np.ndarray,
+        sym_idx: np.ndarray,
+        price: np.ndarray,
+        qty: np.ndarray,
+        fee: np.ndarray,
+    ):
+        self.index = index
+        self.symbols: List[str] = list(symbols)
+        self.bar_idx = bar_idx
+        self.sym_idx = sym_idx
+        self.price = price
+        self.qty = qty
+        self.fee = fee
+
+        k = len(price)
+        if not (len(bar_idx) == len(sym_idx) == len(qty) == len(fee) == k):
+            raise ValueError("FillHistory: несовместимые размеры массивов")
+
+    @cached_property
+    def ts(self) -> pd.Index:
+        """Время каждой сделки (index.take(bar_idx))."""
+        return self.index.take(self.bar_idx)
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @overload
+    def __getitem__(self, i: int) -> Fill: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[Fill]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Fill, List[Fill]]:
+        if isinstance(i, slice):
+            return [self.as_fill(j) for j in range(*i.indices(len(self)))]
+        return self.as_fill(i)
+
+    def __iter__(self) -> Iterator[Fill]:
+        # пачкой: tolist() вместо поэлементного боксинга numpy-скаляров
+        symbols = self.symbols
+        for ts, j, px, q, f in zip(
+            self.ts, self.sym_idx.tolist(), self.price.tolist(), self.qty.tolist(), self.fee.tolist()
+        ):
+            yield Fill(symbol=symbols[j], ts=ts, price=px, qty=q, fee=f)
+
+    def as_fill(self, i: int) -> Fill:
+        """Fill сделки номер i (поддерживаются отрицательные i)."""
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("FillHistory index out of range")
+        return Fill(
+            symbol=self.symbols[int(self.sym_idx[i])],
+            ts=self.ts[i],
+            price=float(self.price[i]),
+            qty=float(self.qty[i]),
+            fee=float(self.fee[i]),
+        )
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from pathlib import Path
+import time
+
+import numpy as np
 import pandas as pd
 from .core_types import MarketData
 
@@ -34,17 +38,75 @@ class CSVDataSource(DataSource):
 
 class YahooDataSource(DataSource):
     """
-    Заглушка для источника данных из Yahoo (yfinance).
-    Реализацию добавим позже.
+    Источник данных из Yahoo (yfinance).
+
+    Кэш:
+    - уже нормализованные bars сохраняются в Parquet в cache_dir,
+      ключ — (symbol, start, end, auto_adjust)
+    - при end=None кэш не читается и не пишется: открытый диапазон растёт
+      с каждым новым баром, и закэшированные данные сразу устаревают
+    - запись старше cache_ttl секунд скачивается заново: при auto_adjust=True
+      Yahoo задним числом пересчитывает цены после дивидендов/сплитов
+    - cache_dir по умолчанию относительный (".cache/yahoo"), т.е. кэш
+      создаётся в текущей рабочей директории вызывающего процесса
+    - cache_dir=None отключает кэш; без pyarrow кэш тоже молча не используется
+      (ни чтения, ни записи, каждый вызов идёт в сеть)
     """
 
-    def __init__(self, symbol: str, start: str, end: str | None = None, auto_adjust: bool = True):
+    def __init__(
+        self,
+        symbol: str,
+        start: str,
+        end: str | None = None,
+        auto_adjust: bool = True,
+        cache_dir: str | Path | None = ".cache/yahoo",
+        cache_ttl: float = 24 * 3600.0,
+    ):
         self.symbol = symbol
         self.start = start
         self.end = end
         self.auto_adjust = auto_adjust
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.cache_ttl = cache_ttl
+
+    def _cache_path(self) -> Path | None:
+        if self.cache_dir is None or self.end is None:
+            return None
+        name = f"{self.symbol}_{self.start}_{self.end}_{int(self.auto_adjust)}.parquet"
+        return self.cache_dir / name
+
+    def _read_cache(self, path: Path) -> pd.DataFrame | None:
+        try:
+            if time.time() - path.stat().st_mtime > self.cache_ttl:
+                return None
+            return pd.read_parquet(path, engine="pyarrow")
+        except Exception:
+            # нет файла / нет pyarrow / битый файл — просто идём в сеть
+            return None
+
+    def _write_cache(self, path: Path, bars: pd.DataFrame) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            bars.to_parquet(tmp, engine="pyarrow", compression="zstd")
+            tmp.replace(path)
+        except Exception:
+            # кэш — только оптимизация, его отсутствие не должно ронять прогон
+            pass
 
     def get_bars(self) -> MarketData:
+        cache = self._cache_path()
+        if cache is not None:
+            bars = self._read_cache(cache)
+            if bars is not None:
+                return MarketData(bars=bars, symbol=self.symbol)
+
+        md = self._download()
+        if cache is not None:
+            self._write_cache(cache, md.bars)
+        return md
+
+    def _download(self) -> MarketData:
         try:
             import yfinance as yf
         except ImportError as e:
@@ -92,15 +154,15 @@ class YahooDataSource(DataSource):
         bars = df[required].copy()
         bars.columns.name = None
 
-        # Типы
-        for c in ["Open", "High", "Low", "Close", "Volume"]:
-            bars[c] = pd.to_numeric(bars[c], errors="raise")
+        # Типы: yfinance и так отдаёт float64, поэтому это либо no-op,
+        # либо один C-level cast на колонку (вместо pd.to_numeric по каждой)
+        bars = bars.astype(dict.fromkeys(required, np.float64))
 
         # Санити-проверки (лучше упасть, чем молча продолжать)
         if not bars.index.is_monotonic_increasing:
             raise ValueError("Индекс времени должен быть монотонно возрастающим")
-        if bars[["Open", "High", "Low", "Close"]].isna().any().any():
+        # NaN в OHLC — один проход по непрерывному блоку
+        if np.isnan(bars[["Open", "High", "Low", "Close"]].to_numpy()).any():
             raise ValueError("Обнаружены NaN в OHLC")
 
         return MarketData(bars=bars, symbol=self.symbol)
-        
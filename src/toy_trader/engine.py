@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Sequence
 
-from .core_types import MarketData, Signals, Fill, PortfolioState, Cash
+from .core_types import MarketData, Signals, Fill, PortfolioState, Cash, portfolio_soa
 from .data_sources import DataSource
 from .strategies import Strategy
 from .execution import ExecutionModel
@@ -21,8 +21,18 @@ class BacktestResult:
     """
     market_data: MarketData
     signals: Signals
-    fills: List[Fill]
-    states: List[PortfolioState]
+    fills: Sequence[Fill]  # FillHistory у встроенных execution-моделей
+    states: Sequence[PortfolioState]  # PortfolioHistory у встроенных execution-моделей
+    soa: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+
+    def states_soa(self) -> Dict[str, Any]:
+        """
+        История портфеля в виде массивов (см. core_types.portfolio_soa):
+        equity[T], cash[T], positions[symbol][T].
+        """
+        if self.soa is not None:
+            return self.soa
+        return portfolio_soa(self.states, [self.market_data.symbol])
 
 
 class BacktestEngine:
@@ -41,15 +51,49 @@ class BacktestEngine:
         strategy: Strategy,
         execution_model: ExecutionModel,
         initial_cash: Cash = 10_000.0,
+        cache: Optional[Dict[Any, Any]] = None,
     ):
         self.data_source = data_source
         self.strategy = strategy
         self.execution_model = execution_model
         self.initial_cash: Cash = initial_cash
 
+        # Общий (между engine'ами) кэш этапов пайплайна для sweep'ов:
+        # один и тот же data_source -> одни и те же bars,
+        # одна и та же стратегия (по _cache_key) на тех же bars -> те же сигналы.
+        # None — без кэша, как раньше.
+        self.cache = cache
+
+    def _cached(self, key: Any, anchor: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Достаёт значение из self.cache или считает и кладёт его туда.
+
+        Ключи строятся на id() объектов, поэтому рядом со значением храним
+        сам объект (anchor): он не даст id переиспользоваться, и совпадение
+        проверяется по identity.
+        """
+        if self.cache is None:
+            return compute()
+        hit = self.cache.get(key)
+        if hit is not None and hit[0] is anchor:
+            return hit[1]
+        value = compute()
+        self.cache[key] = (anchor, value)
+        return value
+
     def run(self) -> BacktestResult:
-        md = self.data_source.get_bars()
-        sig = self.strategy.generate_signals(md)
+        ds = self.data_source
+        md = self._cached(("bars", id(ds)), ds, ds.get_bars)
+
+        strategy_key = self.strategy._cache_key() if self.cache is not None else None
+        if strategy_key is None:
+            sig = self.strategy.generate_signals(md)
+        else:
+            sig = self._cached(
+                ("signals", id(md), strategy_key),
+                md,
+                lambda: self.strategy.generate_signals(md),
+            )
 
         initial_state = PortfolioState(cash=self.initial_cash)
         fills, states = self.execution_model.run(md, sig, initial_state)
@@ -59,4 +103,5 @@ class BacktestEngine:
             signals=sig,
             fills=fills,
             states=states,
+            soa=portfolio_soa(states, [md.symbol]),
         )
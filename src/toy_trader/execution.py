@@ -2,14 +2,15 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Tuple, Optional, Dict
+from typing import Literal, Tuple, Optional, Sequence
 
-import pandas as pd
+import numpy as np
 
-from .core_types import MarketData, Signals, Fill, PortfolioState, Qty, Price, Cash
+from ._njit import njit
+from .core_types import MarketData, Signals, Fill, FillHistory, PortfolioState, PortfolioHistory, Qty, Cash
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ExecutionParams:
     """
     Параметры модели исполнения (toy-уровень).
@@ -19,11 +20,120 @@ class ExecutionParams:
     fill_price: какую цену бара считаем ценой исполнения
       - "open"  : исполняем на Open
       - "close" : исполняем на Close (часто некорректно для честного backtest, но полезно для экспериментов)
+    precision: в какой точности держать цены/цели внутри execution
+      - "f64" : float64 (по умолчанию, результат бит-в-бит как раньше)
+      - "f32" : float32 для входных массивов и хранимой истории positions /
+                last_prices (вдвое меньше памяти на длинных историях);
+                cash/equity (и позиция внутри ядра) всё равно считаются во float64
     """
     fee_bps: float = 1.0
     slippage_bps: float = 1.0
     fill_price: str = "open"
     eps: float = 1e-12 # Round-off of nearly-zero positions
+    precision: Literal["f64", "f32"] = "f64"
+
+
+def _price_dtype(params: ExecutionParams) -> type:
+    """numpy dtype входных массивов по ExecutionParams.precision."""
+    if params.precision == "f64":
+        return np.float64
+    if params.precision == "f32":
+        return np.float32
+    raise ValueError("precision должен быть 'f64' или 'f32'")
+
+
+@njit(cache=True)
+def _run_frac(close_arr, buy_px, sell_px, target_arr, cash0, pos0, other_value, fee_rate, eps):
+    """
+    Ядро NextBarExecutionModel: sizing долей equity (A1) + A1.1 clamp по кэшу.
+
+    Вход — float64- (или float32-) массивы одинаковой длины (target уже без NaN, в [0,1]);
+    buy_px/sell_px — цены исполнения с уже учтённым проскальзыванием
+    (считаются снаружи векторно, в ядре остаётся только выбор по знаку delta).
+    Выход:
+    - fill_idx, fill_price, fill_qty, fill_fee — сделки (обрезаны до числа fills)
+    - cash_arr, pos_arr, equity_arr — состояние на конец каждого бара
+    """
+    n = close_arr.shape[0]
+    fill_idx = np.empty(n, dtype=np.int64)
+    fill_price = np.empty(n, dtype=np.float64)
+    fill_qty = np.empty(n, dtype=np.float64)
+    fill_fee = np.empty(n, dtype=np.float64)
+    cash_arr = np.empty(n, dtype=np.float64)
+    pos_arr = np.empty(n, dtype=np.float64)
+    equity_arr = np.empty(n, dtype=np.float64)
+
+    cash = cash0
+    cur_qty = pos0
+    max_buy_qty = 0.0
+    nf = 0
+
+    for i in range(n):
+        # 1) sizing по CLOSE текущего бара
+        close_price = close_arr[i]
+        equity_for_sizing = cash + other_value + cur_qty * close_price
+        desired_qty = (target_arr[i] * equity_for_sizing) / close_price
+
+        # 2) delta > 0 => купить, delta < 0 => продать
+        delta = desired_qty - cur_qty
+
+        if abs(delta) > eps:
+            # проскальзывание: покупка дороже, продажа дешевле
+            exec_price = buy_px[i] if delta > 0 else sell_px[i]
+
+            # A1.1: покупка не больше, чем позволяет кэш (с учётом комиссии)
+            if delta > 0:
+                denom = exec_price * (1.0 + fee_rate)
+                max_buy_qty = cash / denom if denom > 0 else 0.0
+                if max_buy_qty < 0:
+                    max_buy_qty = 0.0
+            if delta > max_buy_qty:
+                delta = max_buy_qty
+
+            # A1.1-2: guard AFTER clamping
+            if abs(delta) > eps:
+                fee = abs(delta) * exec_price * fee_rate
+
+                cash -= delta * exec_price
+                cash -= fee
+                if abs(cash) < eps:
+                    cash = 0.0
+
+                new_qty = cur_qty + delta
+                cur_qty = 0.0 if abs(new_qty) < eps else new_qty
+
+                fill_idx[nf] = i
+                fill_price[nf] = exec_price
+                fill_qty[nf] = delta
+                fill_fee[nf] = fee
+                nf += 1
+
+        cash_arr[i] = cash
+        pos_arr[i] = cur_qty
+        equity_arr[i] = cash + other_value + cur_qty * close_price
+
+    return (
+        fill_idx[:nf],
+        fill_price[:nf],
+        fill_qty[:nf],
+        fill_fee[:nf],
+        cash_arr,
+        pos_arr,
+        equity_arr,
+    )
+
+
+def _run_flat(close_arr, cash0, other_value):
+    """
+    Тот же выход, что у _run_frac, для случая "target == 0 везде и позиции нет":
+    сделок нет, cash и qty постоянны, equity = cash + прочие позиции.
+    """
+    n = close_arr.shape[0]
+    empty_f = np.empty(0, dtype=np.float64)
+    cash_arr = np.full(n, cash0, dtype=np.float64)
+    pos_arr = np.zeros(n, dtype=np.float64)
+    equity_arr = cash_arr + other_value + pos_arr * close_arr
+    return np.empty(0, dtype=np.int64), empty_f, empty_f, empty_f, cash_arr, pos_arr, equity_arr
 
 
 class ExecutionModel(ABC):
@@ -32,7 +142,8 @@ class ExecutionModel(ABC):
 
     Контракт:
     - вход: MarketData, Signals, начальный PortfolioState
-    - выход: (fills, states) — список фактов сделок и список состояний портфеля во времени
+    - выход: (fills, states) — список фактов сделок и состояния портфеля во времени
+      (последовательность PortfolioState; встроенные модели отдают PortfolioHistory)
 
     Важно:
     - execution НЕ генерирует сигнал
@@ -46,7 +157,7 @@ class ExecutionModel(ABC):
         md: MarketData,
         sig: Signals,
         initial_state: PortfolioState,
-    ) -> Tuple[List[Fill], List[PortfolioState]]:
+    ) -> Tuple[Sequence[Fill], Sequence[PortfolioState]]:
         raise NotImplementedError
 
 
@@ -66,6 +177,7 @@ class NextBarExecutionModel(ExecutionModel):
         self.params = params or ExecutionParams()
         if self.params.fill_price not in ("open", "close"):
             raise ValueError("fill_price должен быть 'open' или 'close'")
+        self._dtype = _price_dtype(self.params)
 
     #def run(
     #    self,
@@ -80,7 +192,7 @@ class NextBarExecutionModel(ExecutionModel):
         md: MarketData,
         sig: Signals,
         initial_state: PortfolioState,
-    ) -> Tuple[List[Fill], List[PortfolioState]]:
+    ) -> Tuple[Sequence[Fill], Sequence[PortfolioState]]:
         """
         Исполняем стратегию в стиле toy-backtest.
 
@@ -100,7 +212,9 @@ class NextBarExecutionModel(ExecutionModel):
         # 1) Синхронизация времени
         # Очень важно: сигналы и бары должны иметь одинаковый индекс (одинаковые даты).
         # Иначе вы думаете, что торгуете на одних датах, а реально — на других.
-        if not sig.target_position.index.equals(bars.index):
+        # is — быстрый путь: обычно сигналы построены прямо на bars.index
+        sig_index = sig.target_position.index
+        if sig_index is not bars.index and not sig_index.equals(bars.index):
             raise ValueError("Signals.target_position.index должен совпадать с MarketData.bars.index")
 
         # 2) Какую цену бара считаем ценой исполнения сделки
@@ -108,148 +222,100 @@ class NextBarExecutionModel(ExecutionModel):
         # а в DataFrame колонки "Open"/"Close" (с заглавной).
         fill_col = "Open" if self.params.fill_price == "open" else "Close"
 
-        target = sig.target_position  # Series с 0/1 по времени
-
-        fills: List[Fill] = []        # сюда будем складывать факты сделок
-        states: List[PortfolioState] = []  # сюда снимки портфеля на каждом баре
-
-        # 3) Берём начальное состояние и делаем рабочие копии
-        # Мы НЕ хотим мутировать initial_state (это плохая привычка для backtest),
-        # поэтому забираем значения в локальные переменные.
+        # 3) Один раз достаём колонки в NumPy: дальше цикл работает только
+        # с позиционным доступом к массивам (без iterrows и .loc[ts]).
+        # dtype — по params.precision; накопление cash/equity в ядре — float64.
+        index = bars.index
+        n = len(bars)
+        dtype = self._dtype
+        close_arr = bars["Close"].to_numpy(dtype=dtype)
+        # fill_price="close" — тот же массив, без второго извлечения столбца
+        fill_arr = close_arr if fill_col == "Close" else bars[fill_col].to_numpy(dtype=dtype)
+
+        # Параметры исполнения — в локальные скаляры один раз (ядру нужны
+        # обычные float, а не атрибуты dataclass)
+        slip = self.params.slippage_bps / 10_000.0
+        fee_rate = self.params.fee_bps / 10_000.0
+        eps = self.params.eps
+
+        # Цены исполнения с проскальзыванием — сразу по всем барам:
+        # покупка платит fill*(1+slip), продажа получает fill*(1-slip).
+        buy_px = fill_arr * dtype(1.0 + slip)
+        sell_px = fill_arr * dtype(1.0 - slip)
+
+        # Желаемая доля капитала (fraction) из сигналов: NaN -> 0, проверка [0,1]
+        # сразу по всему массиву.
+        # Копию делаем только если NaN действительно есть.
+        target_arr = sig.target_position.to_numpy(dtype=dtype)
+        nan_mask = np.isnan(target_arr)
+        if nan_mask.any():
+            target_arr = np.where(nan_mask, dtype(0.0), target_arr)
+        bad = ~((target_arr >= 0.0) & (target_arr <= 1.0))
+        if bad.any():
+            j = int(np.flatnonzero(bad)[0])
+            raise ValueError(f"target_fraction ∈ [0,1], получено {float(target_arr[j])} на {index[j]}")
+
+        # 4) Начальное состояние. initial_state НЕ мутируем.
+        # Позиции по другим инструментам в этой модели не торгуются,
+        # их вклад в equity — константа по последним известным ценам.
         cash: Cash = initial_state.cash
-        positions: dict[str, Qty] = dict(initial_state.positions)      # копия словаря позиций
-        last_prices = dict(initial_state.last_prices)  # копия словаря последних цен
-
-        # 4) Функция для расчёта equity (стоимости портфеля)
-        # equity = cash + сумма(qty * last_price) по всем инструментам.
-        def compute_equity(cash_: Cash, pos_: Dict[str, Qty], lp_: Dict[str, Price]) -> float:
-            eq = cash_
-            for sym, qty in pos_.items():
-                price = lp_.get(sym)  # последняя известная цена инструмента
-                if price is None:
-                    # нет цены — не можем оценить вклад; для MVP можно просто пропустить
-                    continue
-                eq += qty * price
-            return float(eq)
-
-        # 5) Основной цикл: идём бар за баром по времени
-        for ts, row in bars.iterrows():
-            # ts — timestamp текущего бара (дата/время)
-            # row — строка DataFrame со значениями Open/High/Low/Close/Volume
-
-            # 5.1) Обновляем "последнюю цену" для mark-to-market
-            # Для оценки портфеля удобно брать Close текущего бара.
-            close_price = float(row["Close"])
-            last_prices[symbol] = close_price
-
-            # 5.2) Текущая позиция в этом инструменте (сколько единиц держим сейчас)
-            cur_qty: Qty = positions.get(symbol, 0.0)  # если позиции нет — считаем 0
-
-            # 5.3) Желаемая доля капитала (fraction) из сигналов: [0,1]
-            desired_raw = target.loc[ts]
-
-            if pd.isna(desired_raw):
-                target_fraction: float = 0.0
-            else:
-                target_fraction = float(desired_raw)
-
-            if not (0.0 <= target_fraction <= 1.0):
-                raise ValueError(f"target_fraction ∈ [0,1], получено {target_fraction} на {ts}")
-
-            # sizing по CLOSE
-            equity_for_sizing = compute_equity(cash, positions, last_prices)
-            desired_qty: Qty = (target_fraction * equity_for_sizing) / close_price
-            
-            # 5.4) Сколько нужно купить/продать, чтобы перейти к желаемой позиции
-            # delta > 0  => надо купить delta единиц
-            # delta < 0  => надо продать |delta| единиц
-            delta: Qty = desired_qty - cur_qty
-
-            # 5.5) Если позиция уже как надо — сделки нет
-            if abs(delta) > self.params.eps:
-                # 5.5.1) Берём базовую цену исполнения с текущего бара
-                raw_price = float(row[fill_col])
-
-                # 5.5.2) Проскальзывание (slippage)
-                # В bps: 1 bps = 0.01% = 0.0001
-                slip = self.params.slippage_bps / 10_000.0
-
-                # Логика:
-                # - покупка: платим чуть дороже (цена ↑)
-                # - продажа: продаём чуть дешевле (цена ↓)
-                if delta > 0:
-                    exec_price = raw_price * (1.0 + slip)
-                else:
-                    exec_price = raw_price * (1.0 - slip)
-
-                # --- A1.1: limit buy size by available cash (spot trading constraint)
-                # We size positions using target_fraction * equity, but execution price
-                # includes slippage and we also pay a fee.
-                # Without this clamp, an "all-in" signal could overspend cash by fees.
-
-                fee_rate = self.params.fee_bps / 10_000.0
-
-                if delta > 0:
-                    denom = exec_price * (1.0 + fee_rate)
-                    max_buy_qty = cash / denom if denom > 0 else 0.0
-                    if max_buy_qty < 0:
-                        max_buy_qty = 0.0
-                if delta > max_buy_qty:
-                    delta = max_buy_qty
-                    
-                # A1.1-2: guard AFTER clamping
-                if abs(delta) <= self.params.eps:
-                    delta = 0.0
-
-                # 5.5.3) Комиссия (fee) тоже в bps от оборота (notional)
-                # notional = |qty| * price
-                
-                # применять сделку ТОЛЬКО если delta всё ещё значима
-                if abs(delta) > self.params.eps:
-                
-                    notional = abs(delta) * exec_price
-                    fee = notional * (self.params.fee_bps / 10_000.0)
-
-                    # 5.5.4) Обновляем cash
-                    # Если delta>0 (покупка): cash уменьшается на delta*price
-                    # Если delta<0 (продажа): cash увеличивается, потому что "-delta*price" вычитает отрицательное
-                    cash -= delta * exec_price
-
-                    # Комиссия всегда уменьшает cash
-                    cash -= fee
-                    
-                    if abs(cash) < self.params.eps:
-                        cash = 0.0
-
-                    # 5.5.5) Обновляем позицию
-                    new_qty: Qty = cur_qty + delta
-                    if abs(new_qty) < self.params.eps:
-                        # если стало 0 — можно удалить запись из словаря
-                        positions.pop(symbol, None)
-                    else:
-                        positions[symbol] = new_qty
-
-                    # 5.5.6) Записываем факт сделки (Fill)
-                    fills.append(
-                        Fill(
-                            symbol=symbol,
-                            ts=pd.Timestamp(ts),
-                            price=float(exec_price),
-                            qty=delta,      # +1 buy, -1 sell (в MVP)
-                            fee=float(fee),
-                        )
-                    )
-
-            # 5.6) В конце бара делаем "снимок" состояния портфеля
-            equity = compute_equity(cash, positions, last_prices)
-
-            states.append(
-                PortfolioState(
-                    cash=float(cash),
-                    positions=dict(positions),       # копии, чтобы прошлое не менялось
-                    last_prices=dict(last_prices),
-                    equity=float(equity),
-                )
+        cur_qty: Qty = initial_state.positions.get(symbol, 0.0)
+        other_value = 0.0
+        for sym, qty in initial_state.positions.items():
+            price = initial_state.last_prices.get(sym)
+            if sym != symbol and price is not None:
+                other_value += qty * price
+
+        # 5) Два режима:
+        # - стратегия ни разу не хочет в рынок, позиции нет — сделок не будет,
+        #   история считается векторно (_run_flat);
+        # - иначе рекуррентность через cash (sizing зависит от текущего equity) —
+        #   скалярное ядро _run_frac (numba, если установлена).
+        # Отдельного "0/1 = одна единица актива" пути нет: target — доля equity,
+        # и даже при 0/1 qty зависит от текущего кэша.
+        if cur_qty == 0.0 and not target_arr.any():
+            fill_idx, fill_price, fill_qty, fill_fee, cash_arr, pos_arr, equity_arr = _run_flat(
+                close_arr,
+                float(cash),
+                float(other_value),
+            )
+        else:
+            fill_idx, fill_price, fill_qty, fill_fee, cash_arr, pos_arr, equity_arr = _run_frac(
+                close_arr,
+                buy_px,
+                sell_px,
+                target_arr,
+                float(cash),
+                float(cur_qty),
+                float(other_value),
+                fee_rate,
+                eps,
             )
 
+        # 6) Fill'ы — массивы ядра как есть, Fill-объекты собираются лениво
+        fills = FillHistory(
+            index=index,
+            symbols=[symbol],
+            bar_idx=fill_idx,
+            sym_idx=np.zeros(len(fill_idx), dtype=np.int64),
+            price=fill_price,
+            qty=fill_qty,
+            fee=fill_fee,
+        )
+
+        # 7) История портфеля — массивы как есть, PortfolioState собираются лениво.
+        # equity уже посчитан во float64; хранимую историю qty можно ужать до precision
+        if pos_arr.dtype != dtype:
+            pos_arr = pos_arr.astype(dtype)
+        states = PortfolioHistory(
+            index=index,
+            symbols=[symbol],
+            cash=cash_arr,
+            positions=pos_arr.reshape(n, 1),
+            last_prices=close_arr.reshape(n, 1),
+            equity=equity_arr,
+            base_positions={k: v for k, v in initial_state.positions.items() if k != symbol},
+            base_prices={k: v for k, v in initial_state.last_prices.items() if k != symbol},
+        )
+
         return fills, states
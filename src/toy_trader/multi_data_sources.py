@@ -1,18 +1,42 @@
 from __future__ import annotations
 
+import importlib.metadata
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property, reduce
 from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
 from .core_types import MarketData
 from .data_sources import YahooDataSource
 
 
+def _yfinance_download_is_reentrant() -> bool:
+    """
+    True, если установленный yfinance (>= 1.4) хранит состояние download
+    на вызов и его можно звать из нескольких потоков одновременно.
+    """
+    try:
+        version = importlib.metadata.version("yfinance")
+    except importlib.metadata.PackageNotFoundError:
+        # пакета нет — YahooDataSource сам выдаст понятную ошибку
+        return False
+    try:
+        major, minor = (int(part) for part in version.split(".")[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (1, 4)
+
+
 @dataclass(frozen=True)
 class MultiMarketData:
     """
     Набор MarketData для нескольких символов с общим временем (одинаковый DatetimeIndex).
+
+    Помимо словаря по символам есть "широкий" вид (SoA): opens/closes —
+    DataFrame [T, N] с колонками = symbols, строятся один раз и кэшируются.
     """
     data: Dict[str, MarketData]
 
@@ -26,6 +50,21 @@ class MultiMarketData:
         first = next(iter(self.data.values()))
         return first.bars.index
 
+    def wide(self, column: str) -> pd.DataFrame:
+        """Одна колонка баров по всем символам: DataFrame [T, N] (float64, колонки = symbols)."""
+        return pd.DataFrame(
+            {sym: md.bars[column].to_numpy(dtype=np.float64) for sym, md in self.data.items()},
+            index=self.index,
+        )
+
+    @cached_property
+    def opens(self) -> pd.DataFrame:
+        return self.wide("Open")
+
+    @cached_property
+    def closes(self) -> pd.DataFrame:
+        return self.wide("Close")
+
 
 class MultiYahooDataSource:
     """
@@ -48,19 +87,26 @@ class MultiYahooDataSource:
         self.end = end
 
     def get_bars(self) -> MultiMarketData:
-        # 1) Скачиваем данные по каждому символу
-        per_symbol: Dict[str, MarketData] = {}
-        for sym in self.symbols:
-            ds = YahooDataSource(symbol=sym, start=self.start, end=self.end)
-            md = ds.get_bars()
-            per_symbol[sym] = md
+        # 1) Скачиваем данные по каждому символу — параллельно в потоках:
+        # загрузка упирается в сеть (GIL отпускается). Начиная с yfinance 1.4
+        # download держит состояние на вызов; до этого результаты копились в
+        # глобальном shared._DFS и параллельные вызовы могли перепутать тикеры,
+        # поэтому на старых версиях качаем последовательно (один поток).
+        workers = min(16, len(self.symbols)) if _yfinance_download_is_reentrant() else 1
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {
+                sym: ex.submit(YahooDataSource(symbol=sym, start=self.start, end=self.end).get_bars)
+                for sym in self.symbols
+            }
+            # порядок символов сохраняем как в self.symbols
+            per_symbol: Dict[str, MarketData] = {sym: f.result() for sym, f in futures.items()}
 
         # 2) Выравниваем индекс: пересечение дат
-        common_index: Optional[pd.DatetimeIndex] = None
-        for md in per_symbol.values():
-            common_index = md.bars.index if common_index is None else common_index.intersection(md.bars.index)
+        common_index: pd.DatetimeIndex = reduce(
+            pd.Index.intersection, (md.bars.index for md in per_symbol.values())
+        )
 
-        if common_index is None or len(common_index) == 0:
+        if len(common_index) == 0:
             raise ValueError("No common timestamps across symbols")
 
         # 3) Обрезаем бары по common_index
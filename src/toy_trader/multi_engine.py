@@ -1,11 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence
 
+import numpy as np
 import pandas as pd
 
-from .core_types import Signals, Fill, PortfolioState
+from .core_types import Signals, Fill, PortfolioState, portfolio_soa
 from .multi_data_sources import MultiMarketData, MultiYahooDataSource
 from .strategies import Strategy
 from .multi_execution import MultiNextBarExecutionModel
@@ -23,8 +27,31 @@ class MultiBacktestResult:
     """
     market_data: MultiMarketData
     signals: Dict[str, Signals]
-    fills: List[Fill]
-    states: List[PortfolioState]
+    fills: Sequence[Fill]  # FillHistory у встроенных execution-моделей
+    states: Sequence[PortfolioState]  # PortfolioHistory у встроенных execution-моделей
+    soa: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+
+    def states_soa(self) -> Dict[str, Any]:
+        """
+        История портфеля в виде массивов (см. core_types.portfolio_soa):
+        equity[T], cash[T], positions[symbol][T].
+        """
+        if self.soa is not None:
+            return self.soa
+        return portfolio_soa(self.states, self.market_data.symbols)
+
+
+def _aligned_values(target: pd.Series, idx: pd.Index) -> np.ndarray:
+    """
+    Значения target_position в порядке общего индекса idx.
+
+    Стратегия может вернуть Series на том же наборе меток, но в другом
+    порядке — тогда выравниваем по меткам через .loc (как раньше .loc[ts]),
+    а не по позиции; отсутствующая метка даёт KeyError.
+    """
+    if not (target.index is idx or target.index.equals(idx)):
+        target = target.loc[idx]
+    return target.to_numpy(dtype=np.float64)
 
 
 class MultiBacktestEngine:
@@ -46,6 +73,8 @@ class MultiBacktestEngine:
         allocator: Optional[AllocationModel] = None,
         allocation_budget: float = 1.0,
         initial_cash: float = 10_000.0,
+        parallel: bool = False,
+        max_workers: Optional[int] = None,
     ):
         self.data_source = data_source
         self.strategy = strategy
@@ -57,6 +86,37 @@ class MultiBacktestEngine:
         self.allocation_budget = float(allocation_budget)
         self.initial_cash = float(initial_cash)
 
+        # параллельная генерация сигналов по символам (процессы, только fork)
+        self.parallel = bool(parallel)
+        self.max_workers = max_workers
+
+    def _generate_raw_signals(self, mmd: MultiMarketData) -> Dict[str, Signals]:
+        """
+        RAW сигналы по каждому символу.
+
+        Символы независимы, поэтому при parallel=True считаем их в пуле
+        процессов (CPU-bound, GIL не отпускается). Только для fork:
+        дочерние процессы наследуют уже импортированные модули, а при
+        spawn старт новых интерпретаторов съедает весь выигрыш.
+        Для одного символа или без fork — обычный последовательный проход.
+        """
+        items = list(mmd.data.items())
+        use_pool = (
+            self.parallel
+            and len(items) > 1
+            and "fork" in multiprocessing.get_all_start_methods()
+        )
+        if not use_pool:
+            return {sym: self.strategy.generate_signals(md) for sym, md in items}
+
+        workers = self.max_workers or min(len(items), os.cpu_count() or 1)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+        ) as ex:
+            results = list(ex.map(self.strategy.generate_signals, [md for _, md in items]))
+        return {sym: sig for (sym, _), sig in zip(items, results)}
+
     def run(self) -> MultiBacktestResult:
         # 1) Загружаем и выравниваем данные
         mmd = self.data_source.get_bars()
@@ -64,42 +124,25 @@ class MultiBacktestEngine:
 
         # 2) Генерируем RAW сигналы по каждому символу
         # Эти сигналы МОГУТ быть портфельно неконсистентны
-        raw_sigs: Dict[str, Signals] = {}
-        for sym, md in mmd.data.items():
-            raw_sigs[sym] = self.strategy.generate_signals(md)
-
-        # 3) Allocation: на каждом timestamp
-        #    raw signals -> portfolio weights
-        weights_by_sym: Dict[str, List[float]] = {
-            sym: [] for sym in mmd.symbols
-        }
-
-        for ts in idx:
-            # собираем raw intent на этот бар
-            raw: Dict[str, float] = {}
-            for sym in mmd.symbols:
-                v = raw_sigs[sym].target_position.loc[ts]
-                raw[sym] = float(v) if v == v else 0.0  # NaN -> 0
+        raw_sigs = self._generate_raw_signals(mmd)
 
-            # ПОРТФЕЛЬНЫЙ ШАГ
-            w = self.allocator.allocate(
-                raw,
-                budget=self.allocation_budget,
-            )
+        # 3) Allocation: одна матрица raw intent [T, N] -> матрица весов [T, N]
+        #    (allocator обрабатывает всю историю сразу, см. allocate_batch)
+        raw = np.column_stack(
+            [_aligned_values(raw_sigs[sym].target_position, idx) for sym in mmd.symbols]
+        )
+        nan_mask = np.isnan(raw)
+        if nan_mask.any():
+            raw[nan_mask] = 0.0  # NaN -> 0, один раз на всю матрицу
+        raw_df = pd.DataFrame(raw, index=idx, columns=list(mmd.symbols), copy=False)
 
-            # сохраняем веса по символам
-            for sym in mmd.symbols:
-                weights_by_sym[sym].append(float(w.get(sym, 0.0)))
+        # ПОРТФЕЛЬНЫЙ ШАГ
+        weights = self.allocator.allocate_batch(raw_df, budget=self.allocation_budget)
 
         # 4) Формируем Signals, которые уже
         #    семантически = target PORTFOLIO WEIGHT
         sigs: Dict[str, Signals] = {
-            sym: Signals(
-                target_position=pd.Series(
-                    weights_by_sym[sym],
-                    index=idx,
-                )
-            )
+            sym: Signals(target_position=pd.Series(weights[sym].to_numpy(dtype=float), index=idx))
             for sym in mmd.symbols
         }
 
@@ -115,4 +158,5 @@ class MultiBacktestEngine:
             signals=sigs,
             fills=fills,
             states=states,
+            soa=portfolio_soa(states, mmd.symbols),
         )
@@ -1,13 +1,109 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
 
-import pandas as pd
+import numpy as np
 
-from .core_types import Fill, PortfolioState, Qty, Price, Cash, Signals
+from ._njit import njit
+from .core_types import Fill, FillHistory, PortfolioState, PortfolioHistory, Signals
 from .multi_data_sources import MultiMarketData
-from .execution import ExecutionParams
+from .execution import ExecutionParams, _price_dtype
+
+
+@njit(cache=True)
+def _run_multi_frac(closes, fill_px, targets, cash0, pos0, other_value, slip_rate, fee_rate, eps):
+    """
+    Ядро MultiNextBarExecutionModel: общий cash, sizing долей equity (A1),
+    A1.1 clamp по кэшу, внутри бара символы исполняются по порядку колонок.
+
+    Вход — матрицы [T, N] (target уже без NaN, в [0,1]; close > 0) и pos0[N].
+    Цена исполнения = fill_px * (1 ± slip_rate), знак — по направлению сделки.
+    Выход:
+    - fill_t, fill_j, fill_price, fill_qty, fill_fee — сделки (бар, слот символа, ...)
+    - cash_hist[T], pos_hist[T, N] — состояние на конец бара
+    """
+    n, m = closes.shape
+    cap = n * m
+    fill_t = np.empty(cap, dtype=np.int64)
+    fill_j = np.empty(cap, dtype=np.int64)
+    fill_price = np.empty(cap, dtype=np.float64)
+    fill_qty = np.empty(cap, dtype=np.float64)
+    fill_fee = np.empty(cap, dtype=np.float64)
+    cash_hist = np.empty(n, dtype=np.float64)
+    pos_hist = np.empty((n, m), dtype=np.float64)
+
+    pos = pos0.copy()
+    cash = cash0
+    nf = 0
+
+    for t in range(n):
+        # стоимость позиций по Close этого бара: один проход O(N) на бар,
+        # дальше внутри бара поддерживается инкрементально (O(1) на сделку)
+        pos_value = 0.0
+        for k in range(m):
+            pos_value += pos[k] * closes[t, k]
+
+        for j in range(m):
+            close_price = closes[t, j]
+            cur_qty = pos[j]
+
+            # sizing по Close: equity = cash + прочие + sum(qty * close)
+            equity_for_sizing = cash + other_value + pos_value
+            desired_qty = (targets[t, j] * equity_for_sizing) / close_price
+
+            delta = desired_qty - cur_qty
+            if math.fabs(delta) <= eps:
+                continue
+
+            # slippage без ветвления: +slip на покупку, -slip на продажу
+            exec_price = fill_px[t, j] * (1.0 + math.copysign(slip_rate, delta))
+
+            # A1.1 constraint: do not overspend on buys
+            if delta > 0:
+                denom = exec_price * (1.0 + fee_rate)
+                max_buy_qty = cash / denom if denom > 0 else 0.0
+                if max_buy_qty < 0:
+                    max_buy_qty = 0.0
+                if delta > max_buy_qty:
+                    delta = max_buy_qty
+
+            if math.fabs(delta) <= eps:
+                continue
+
+            fee = math.fabs(delta) * exec_price * fee_rate
+
+            cash -= delta * exec_price
+            cash -= fee
+            if math.fabs(cash) < eps:
+                cash = 0.0
+
+            new_qty = cur_qty + delta
+            pos[j] = 0.0 if math.fabs(new_qty) < eps else new_qty
+            pos_value += (pos[j] - cur_qty) * close_price
+
+            fill_t[nf] = t
+            fill_j[nf] = j
+            fill_price[nf] = exec_price
+            fill_qty[nf] = delta
+            fill_fee[nf] = fee
+            nf += 1
+
+        # snapshot после обработки всех символов на этом баре
+        # (equity по истории считается снаружи одной векторной операцией)
+        cash_hist[t] = cash
+        pos_hist[t, :] = pos
+
+    return (
+        fill_t[:nf],
+        fill_j[:nf],
+        fill_price[:nf],
+        fill_qty[:nf],
+        fill_fee[:nf],
+        cash_hist,
+        pos_hist,
+    )
 
 
 class MultiNextBarExecutionModel:
@@ -26,126 +122,129 @@ class MultiNextBarExecutionModel:
         self.params = params or ExecutionParams()
         if self.params.fill_price not in ("open", "close"):
             raise ValueError("fill_price должен быть 'open' или 'close'")
+        self._dtype = _price_dtype(self.params)
 
     def run(
         self,
         mmd: MultiMarketData,
         sigs: Dict[str, Signals],
         initial_state: PortfolioState,
-    ) -> Tuple[List[Fill], List[PortfolioState]]:
+    ) -> Tuple[Sequence[Fill], Sequence[PortfolioState]]:
 
         symbols = mmd.symbols
         idx = mmd.index
 
-        # 1) Проверка индексов сигналов
+        dtype = self._dtype
+
+        # 1) Проверка индексов сигналов. Обычно индекс — тот же объект (движок
+        # строит сигналы на mmd.index), иначе equals — по разу на каждый
+        # отдельный объект индекса. Заодно один раз забираем цели массивами.
+        checked = {id(idx)}
+        tgt_np: List[np.ndarray] = []
         for sym in symbols:
             if sym not in sigs:
                 raise ValueError(f"Missing signals for symbol={sym}")
-            if not sigs[sym].target_position.index.equals(idx):
-                raise ValueError(f"Signals index must match bars index for {sym}")
+            tp = sigs[sym].target_position
+            sig_index = tp.index
+            if id(sig_index) not in checked:
+                if not sig_index.equals(idx):
+                    raise ValueError(f"Signals index must match bars index for {sym}")
+                checked.add(id(sig_index))
+            tgt_np.append(tp.to_numpy(dtype=dtype))
 
         fill_col = "Open" if self.params.fill_price == "open" else "Close"
 
-        fills: List[Fill] = []
-        states: List[PortfolioState] = []
-
-        cash: Cash = initial_state.cash
-        positions: dict[str, Qty] = dict(initial_state.positions)
-        last_prices: dict[str, Price] = dict(initial_state.last_prices)
-
-        def compute_equity(cash_: Cash, pos_: dict[str, Qty], lp_: dict[str, Price]) -> float:
-            eq = float(cash_)
-            for sym, qty in pos_.items():
-                px = lp_.get(sym)
+        # Состояние — плотные массивы по слотам symbol -> позиция, одна карта на весь прогон
+        # (никаких dict-lookup'ов в цикле; это же позволяет отдать цикл в njit-ядро).
+        # Позиции по инструментам вне symbols не торгуются: их вклад в equity —
+        # константа по последним известным ценам.
+        symbol_idx: Dict[str, int] = {s: i for i, s in enumerate(symbols)}
+        pos0 = np.zeros(len(symbols), dtype=np.float64)
+        other_value = 0.0
+        for s, q in initial_state.positions.items():
+            if s in symbol_idx:
+                pos0[symbol_idx[s]] = q
+            else:
+                px = initial_state.last_prices.get(s)
                 if px is not None:
-                    eq += float(qty) * float(px)
-            return float(eq)
+                    other_value += q * px
+
+        n = len(idx)
 
+        # Параметры — в локальные переменные один раз (в цикле без self.params.*)
         fee_rate = self.params.fee_bps / 10_000.0
         slip_rate = self.params.slippage_bps / 10_000.0
-
-        # 2) Общий проход по времени
-        for ts in idx:
-            # 2.1) Сначала обновляем last_prices по Close для всех символов
-            for sym in symbols:
-                bars = mmd.data[sym].bars
-                close_px = float(bars.at[ts, "Close"])
-                last_prices[sym] = close_px
-
-            # 2.2) Затем исполняем по каждому символу
-            for sym in symbols:
-                bars = mmd.data[sym].bars
-                row = bars.loc[ts]
-
-                close_price = float(row["Close"])
-                cur_qty: Qty = positions.get(sym, 0.0)
-
-                # target_fraction ∈ [0,1]
-                desired_raw = sigs[sym].target_position.loc[ts]
-                target_fraction = 0.0 if pd.isna(desired_raw) else float(desired_raw)
-                if not (0.0 <= target_fraction <= 1.0):
-                    raise ValueError(f"target_fraction ∈ [0,1], got {target_fraction} for {sym} at {ts}")
-
-                # sizing по Close
-                equity_for_sizing = compute_equity(cash, positions, last_prices)
-                if close_price <= 0:
-                    raise ValueError(f"Close price must be positive, got {close_price} for {sym} at {ts}")
-                desired_qty: Qty = (target_fraction * equity_for_sizing) / close_price
-
-                delta: Qty = desired_qty - cur_qty
-                if abs(delta) <= self.params.eps:
-                    continue
-
-                raw_price = float(row[fill_col])
-
-                # slippage
-                exec_price = raw_price * (1.0 + slip_rate) if delta > 0 else raw_price * (1.0 - slip_rate)
-
-                # A1.1 constraint: do not overspend on buys
-                if delta > 0:
-                    denom = exec_price * (1.0 + fee_rate)
-                    max_buy_qty = cash / denom if denom > 0 else 0.0
-                    if max_buy_qty < 0:
-                        max_buy_qty = 0.0
-                    if delta > max_buy_qty:
-                        delta = max_buy_qty
-
-                if abs(delta) <= self.params.eps:
-                    continue
-
-                notional = abs(delta) * exec_price
-                fee = notional * fee_rate
-
-                cash -= delta * exec_price
-                cash -= fee
-                if abs(cash) < self.params.eps:
-                    cash = 0.0
-
-                new_qty: Qty = cur_qty + delta
-                if abs(new_qty) < self.params.eps:
-                    positions.pop(sym, None)
-                else:
-                    positions[sym] = new_qty
-
-                fills.append(
-                    Fill(
-                        symbol=sym,
-                        ts=pd.Timestamp(ts),
-                        price=float(exec_price),
-                        qty=float(delta),
-                        fee=float(fee),
-                    )
-                )
-
-            # 2.3) Snapshot состояния (после обработки всех символов на этом ts)
-            equity = compute_equity(cash, positions, last_prices)
-            states.append(
-                PortfolioState(
-                    cash=float(cash),
-                    positions=dict(positions),
-                    last_prices=dict(last_prices),
-                    equity=float(equity),
+        eps = self.params.eps
+
+        # 2) Широкие матрицы [T, N] (SoA): цены и цели по всем символам сразу
+        # (dtype — по params.precision).
+        closes = mmd.closes.to_numpy(dtype=dtype)
+        # цена исполнения — один из двух массивов, выбирается один раз на прогон
+        fill_px = mmd.opens.to_numpy(dtype=dtype) if fill_col == "Open" else closes
+        targets = np.column_stack(tgt_np)
+        nan_mask = np.isnan(targets)
+        if nan_mask.any():
+            targets[nan_mask] = 0.0  # NaN -> 0 (column_stack уже дал свою копию)
+
+        # Проверки входа — векторно; ошибка про первую по порядку (бар, символ) ячейку
+        bad_target = ~((targets >= 0.0) & (targets <= 1.0))
+        bad_close = ~(closes > 0)
+        bad = bad_target | bad_close
+        if bad.any():
+            t, j = divmod(int(np.flatnonzero(bad)[0]), len(symbols))
+            if bad_target[t, j]:
+                raise ValueError(
+                    f"target_fraction ∈ [0,1], got {float(targets[t, j])} for {symbols[j]} at {idx[t]}"
                 )
+            raise ValueError(
+                f"Close price must be positive, got {float(closes[t, j])} for {symbols[j]} at {idx[t]}"
             )
 
+        # 3) Проход по времени: cash общий, порядок внутри бара — по symbols.
+        # Проскальзывание применяется в ядре (знак по направлению сделки),
+        # без отдельных матриц buy/sell цен [T, N].
+        fill_t, fill_j, fill_price, fill_qty, fill_fee, cash_hist, pos_hist = _run_multi_frac(
+            closes,
+            fill_px,
+            targets,
+            float(initial_state.cash),
+            pos0,
+            float(other_value),
+            slip_rate,
+            fee_rate,
+            eps,
+        )
+
+        # 4) equity на конец каждого бара — построчное скалярное произведение
+        # qty[T, N] · close[T, N] по всей истории сразу (вместо цикла по символам)
+        equity_hist = cash_hist + other_value + np.einsum("ij,ij->i", pos_hist, closes)
+
+        # equity уже посчитан во float64 — хранимую историю qty [T, N] можно
+        # ужать до precision (f32: вдвое меньше памяти; last_prices = closes уже в dtype)
+        if pos_hist.dtype != dtype:
+            pos_hist = pos_hist.astype(dtype)
+
+        # Fill'ы — массивы ядра как есть, Fill-объекты собираются лениво
+        fills = FillHistory(
+            index=idx,
+            symbols=symbols,
+            bar_idx=fill_t,
+            sym_idx=fill_j,
+            price=fill_price,
+            qty=fill_qty,
+            fee=fill_fee,
+        )
+
+        # mark-to-market по Close: last_prices на конец бара = строка closes
+        states = PortfolioHistory(
+            index=idx,
+            symbols=symbols,
+            cash=cash_hist,
+            positions=pos_hist,
+            last_prices=closes,
+            equity=equity_hist,
+            base_positions={k: v for k, v in initial_state.positions.items() if k not in symbol_idx},
+            base_prices={k: v for k, v in initial_state.last_prices.items() if k not in symbol_idx},
+        )
+
         return fills, states
@@ -18,9 +18,12 @@ toy_trader.reporting
 """
 
 from dataclasses import dataclass
+from typing import Dict, Tuple
 import math
+import numpy as np
 import pandas as pd
 
+from ._njit import NUMBA_AVAILABLE, njit
 from .engine import BacktestResult
 
 
@@ -49,10 +52,12 @@ def equity_curve(res: BacktestResult) -> pd.Series:
     Equity curve ($) как Series с индексом времени.
 
     В single-asset BacktestResult источник времени — market_data.bars.index,
-    а значения equity берём из states (PortfolioState.equity).
+    а значения equity берём из истории портфеля (массив equity, без сборки
+    PortfolioState на каждый бар).
     """
     idx = res.market_data.bars.index
-    eq = pd.Series([s.equity for s in res.states], index=idx, name="equity").astype(float)
+    # массив уже float64 — оборачиваем без копии
+    eq = pd.Series(res.states_soa()["equity"], index=idx, name="equity", dtype=np.float64, copy=False)
     return eq
 
 
@@ -64,11 +69,19 @@ def drawdown_curve(equity: pd.Series) -> pd.Series:
 
     Пример: equity упала с 100 до 80 => dd = -0.2 (-20%)
     """
-    eq = equity.astype(float)
-    peak = eq.cummax()
-    dd = (eq / peak) - 1.0
-    dd.name = "drawdown"
-    return dd
+    dd = _drawdown_array(equity.to_numpy(dtype=np.float64))
+    return pd.Series(dd, index=equity.index, name="drawdown", copy=False)
+
+
+def _drawdown_array(v: np.ndarray) -> np.ndarray:
+    """
+    Drawdown по голому массиву: бегущий максимум одним ufunc-accumulate.
+
+    fmax (а не maximum) — чтобы NaN в equity не "отравлял" пик до конца,
+    как и pandas cummax (NaN пропускается, в самой точке dd = NaN).
+    """
+    peak = np.fmax.accumulate(v)
+    return v / peak - 1.0
 
 
 def max_drawdown(equity: pd.Series) -> float:
@@ -76,8 +89,9 @@ def max_drawdown(equity: pd.Series) -> float:
     Максимальная просадка (минимум drawdown curve).
     Возвращаем отрицательное число (например, -0.23 = -23%).
     """
-    dd = drawdown_curve(equity)
-    return float(dd.min())
+    dd = _drawdown_array(equity.to_numpy(dtype=np.float64))
+    valid = dd[~np.isnan(dd)]
+    return float(valid.min()) if valid.size else float("nan")
 
 
 def _periods_per_year(idx: pd.DatetimeIndex) -> float:
@@ -94,19 +108,134 @@ def _periods_per_year(idx: pd.DatetimeIndex) -> float:
     if len(idx) < 3:
         return 365.25
 
-    deltas = idx.to_series().diff().dropna()
-    if deltas.empty:
-        return 365.25
-
-    med = deltas.median()
-    seconds = float(med.total_seconds())
-    if seconds <= 0:
+    # при переборе стратегий/параметров один и тот же индекс приходит тысячи раз:
+    # кэшируем по id(idx), а рядом храним сам индекс (как в BacktestEngine._cached) —
+    # он не даст id переиспользоваться, совпадение проверяем по identity
+    hit = _PPY_CACHE.get(id(idx))
+    if hit is not None and hit[0] is idx:
+        return hit[1]
+    unit = getattr(idx, "unit", "ns")  # pandas>=2 хранит datetime64 не только в ns
+    ppy = _periods_per_year_uncached(idx.asi8, _TICKS_PER_SECOND[unit])
+    if len(_PPY_CACHE) >= _PPY_CACHE_MAX:
+        _PPY_CACHE.clear()
+    _PPY_CACHE[id(idx)] = (idx, ppy)
+    return ppy
+
+
+_PPY_CACHE: Dict[int, Tuple[pd.DatetimeIndex, float]] = {}
+_PPY_CACHE_MAX = 1024
+_TICKS_PER_SECOND = {"s": 1.0, "ms": 1e3, "us": 1e6, "ns": 1e9}
+
+
+def _periods_per_year_uncached(ticks: np.ndarray, ticks_per_second: float) -> float:
+    # медианный шаг по int64-тикам индекса: np.diff без сборки Series
+    med = float(np.median(np.diff(ticks)))
+    seconds = med / ticks_per_second
+    if not seconds > 0:
         return 365.25
 
     seconds_per_year = 365.25 * 24 * 3600
     return seconds_per_year / seconds
 
 
+def _simple_returns(v: np.ndarray) -> np.ndarray:
+    """
+    r[t] = v[t+1] / v[t] - 1 без pandas: diff + in-place деление (одна аллокация).
+    NaN (пропуски в equity, 0/0) выбрасываем, как pct_change().dropna().
+    """
+    r = np.diff(v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r /= v[:-1]
+    nan = np.isnan(r)
+    return r[~nan] if nan.any() else r
+
+
+def _metrics_from_array(v: np.ndarray, ppy: float) -> Tuple[float, float, float, float]:
+    """
+    (total_return, vol_annual, sharpe, max_drawdown) по массиву equity float64.
+
+    Без pandas — годится для grid-search, где индекс общий и ppy посчитан один раз.
+    С numba — скалярный kernel без промежуточных массивов, иначе NumPy-путь.
+    """
+    if NUMBA_AVAILABLE:
+        tr, vol, sharpe, mdd = _metrics_kernel(v, ppy)
+        return float(tr), float(vol), float(sharpe), float(mdd)
+    return _metrics_numpy(v, ppy)
+
+
+def _metrics_numpy(v: np.ndarray, ppy: float) -> Tuple[float, float, float, float]:
+    # bar-to-bar returns (аналог pct_change().dropna(): NaN выбрасываем)
+    rets = _simple_returns(v)
+
+    total_return = float(v[-1] / v[0] - 1.0)
+
+    # std считаем один раз (ddof=0)
+    if len(rets) > 1:
+        std = float(rets.std())
+        vol_annual = std * math.sqrt(ppy)
+        sharpe = float(rets.mean() / std * math.sqrt(ppy)) if std > 0 else float("nan")
+    else:
+        vol_annual = float("nan")
+        sharpe = float("nan")
+
+    dd = _drawdown_array(v)
+    dd = dd[~np.isnan(dd)]
+    mdd = float(dd.min()) if dd.size else float("nan")
+    return total_return, vol_annual, sharpe, mdd
+
+
+@njit(cache=True, error_model="numpy")
+def _metrics_kernel(v, ppy):
+    """
+    Тот же расчёт, что _metrics_numpy, двумя проходами без аллокаций:
+    1) сумма/счётчик returns + бегущий пик и минимальная просадка
+    2) сумма квадратов отклонений от среднего (стабильнее, чем sum(r^2) - n*mean^2)
+
+    NaN в returns пропускаются; NaN в equity не сдвигает пик (как fmax.accumulate).
+    error_model="numpy": деление на 0 даёт inf/NaN, как в NumPy, а не исключение.
+    """
+    n = v.shape[0]
+    nan = np.nan
+
+    total_return = v[n - 1] / v[0] - 1.0
+
+    # --- pass 1 ---
+    cnt = 0
+    s = 0.0
+    peak = nan
+    mdd = nan
+    for t in range(n):
+        x = v[t]
+        if x == x and (peak != peak or x > peak):
+            peak = x
+        d = x / peak - 1.0
+        if d == d and (mdd != mdd or d < mdd):
+            mdd = d
+        if t > 0:
+            r = (x - v[t - 1]) / v[t - 1]
+            if r == r:
+                s += r
+                cnt += 1
+
+    if cnt <= 1:
+        return total_return, nan, nan, mdd
+
+    mean = s / cnt
+
+    # --- pass 2 ---
+    ss = 0.0
+    for t in range(1, n):
+        r = (v[t] - v[t - 1]) / v[t - 1]
+        if r == r:
+            dev = r - mean
+            ss += dev * dev
+
+    std = math.sqrt(ss / cnt)
+    vol_annual = std * math.sqrt(ppy)
+    sharpe = mean / std * math.sqrt(ppy) if std > 0 else nan
+    return total_return, vol_annual, sharpe, mdd
+
+
 def metrics_from_equity(eq: pd.Series, num_trades: int = 0) -> BasicMetrics:
     """
     Универсальные метрики по equity curve.
@@ -114,34 +243,18 @@ def metrics_from_equity(eq: pd.Series, num_trades: int = 0) -> BasicMetrics:
     Работает и для single-asset, и для multi-asset, потому что вход — только equity Series.
     num_trades передаётся снаружи (для single мы возьмём len(res.fills), для multi аналогично).
     """
-    eq = eq.astype(float)
-
-    # bar-to-bar returns
-    rets = eq.pct_change().dropna()
-
-    # total return
-    total_return = float(eq.iloc[-1] / eq.iloc[0] - 1.0)
+    # один массив float64 — дальше всё считаем по нему, без промежуточных Series
+    v = eq.to_numpy(dtype=np.float64)
 
     # CAGR
     years = (eq.index[-1] - eq.index[0]).total_seconds() / (365.25 * 24 * 3600)
-    cagr = float((eq.iloc[-1] / eq.iloc[0]) ** (1.0 / years) - 1.0) if years > 0 else float("nan")
+    cagr = float((v[-1] / v[0]) ** (1.0 / years) - 1.0) if years > 0 else float("nan")
 
     # annualization
     ppy = _periods_per_year(eq.index)
 
-    # annualized vol and Sharpe (rf = 0)
-    if len(rets) > 1:
-        vol_annual = float(rets.std(ddof=0) * math.sqrt(ppy))
-    else:
-        vol_annual = float("nan")
-
-    if len(rets) > 1 and rets.std(ddof=0) > 0:
-        sharpe = float((rets.mean() / rets.std(ddof=0)) * math.sqrt(ppy))
-    else:
-        sharpe = float("nan")
-
-    # max drawdown
-    mdd = max_drawdown(eq)
+    # total return, annualized vol, Sharpe (rf = 0), max drawdown — по голому массиву
+    total_return, vol_annual, sharpe, mdd = _metrics_from_array(v, ppy)
 
     return BasicMetrics(
         total_return=total_return,
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Optional
+from typing import Hashable, Optional, Sequence
+import math
 
 import pandas as pd
 
+from ._njit import NUMBA_AVAILABLE, aot, njit, prange
 from .core_types import MarketData, Signals
 
 
@@ -25,9 +27,31 @@ class Strategy(ABC):
 
     @abstractmethod
     def generate_signals(self, md: MarketData) -> Signals:
-        raise NotImplementedError    
-
-@dataclass(frozen=True)
+        raise NotImplementedError
+
+    def _cache_key(self) -> Optional[Hashable]:
+        """
+        Ключ для кэширования сигналов (см. BacktestEngine(cache=...)).
+
+        По умолчанию: класс стратегии + её params (frozen dataclass, hashable).
+        Две стратегии с одинаковым ключом на одних и тех же MarketData
+        обязаны давать одинаковые сигналы.
+
+        Стратегии с внутренним состоянием / RNG должны переопределить метод
+        (включить seed в ключ) или вернуть None — тогда кэш не используется.
+        Нехэшируемые params (dict, не-frozen dataclass) => None: включение
+        кэша не должно ломать рабочую стратегию.
+        """
+        params = getattr(self, "params", None)
+        if params is None:
+            return None
+        try:
+            hash(params)
+        except TypeError:
+            return None
+        return (type(self).__module__, type(self).__qualname__, params)
+
+@dataclass(frozen=True, slots=True)
 class SMACrossParams:
     fast: int = 10
     slow: int = 40
@@ -54,33 +78,75 @@ class SMACrossStrategy(Strategy):
             raise ValueError("ожидается fast < slow")
 
     def generate_signals(self, md: MarketData) -> Signals:
-        bars = md.bars
-        close = bars["Close"]
+        arrays = md.arrays
+        c = arrays.close
 
-        fast = close.rolling(
-            window=self.params.fast,
-            min_periods=self.params.fast,
-        ).mean()
+        if NUMBA_AVAILABLE:
+            # один njit-проход: обе SMA (бит-в-бит как pandas rolling), сравнение и лаг
+            target = aot(_sma_cross_loop)(c, self.params.fast, self.params.slow, self.params.shift_for_execution)
+            return Signals(target_position=pd.Series(target, index=arrays.index, name="Close", copy=False))
 
-        slow = close.rolling(
-            window=self.params.slow,
-            min_periods=self.params.slow,
-        ).mean()
+        close = arrays.close_series()
+        fast = close.rolling(window=self.params.fast, min_periods=self.params.fast).mean().to_numpy()
+        slow = close.rolling(window=self.params.slow, min_periods=self.params.slow).mean().to_numpy()
 
         # базовый сигнал: сейчас 1 если fast > slow, иначе 0; 
         # но в принципе может быть дробным (например, входим в BTC на 0.02 от капитала)
-        target = (fast > slow).astype(float)
-
-        # лаг исполнения (на следующий бар)
-        if self.params.shift_for_execution != 0:
-            target = target.shift(self.params.shift_for_execution)
+        # (NaN > x == False => на старте окон flat)
+        target = (fast > slow).astype(np.float64)
 
-        # на начальных барах и после shift → flat
-        target = target.fillna(0.0).astype(float)
+        # лаг исполнения (на следующий бар); освободившиеся бары → flat
+        target = _shift_fill_array(target, self.params.shift_for_execution)
 
+        target = pd.Series(target, index=close.index, name=close.name, copy=False)
         return Signals(target_position=target)
-        
-        
+
+
+def generate_signals_grid(
+    close: pd.Series,
+    fast_list: Sequence[int],
+    slow_list: Sequence[int],
+    shift_for_execution: int = 1,
+) -> pd.DataFrame:
+    """
+    SMA crossover сразу для сетки параметров: K пар (fast_list[k], slow_list[k]).
+
+    Возвращает DataFrame [T, K] с колонками MultiIndex (fast, slow); колонка k
+    совпадает с SMACrossStrategy(SMACrossParams(fast, slow, shift)).generate_signals(...).
+
+    Каждая длина окна считается один раз (общая cumsum / общий njit-проход),
+    а пары — только сравнение готовых массивов, без pandas на каждую ячейку.
+    """
+    if len(fast_list) != len(slow_list):
+        raise ValueError("fast_list и slow_list должны быть одной длины")
+    pairs = [(int(f), int(sl)) for f, sl in zip(fast_list, slow_list)]
+    for f, sl in pairs:
+        if f <= 0 or sl <= 0:
+            raise ValueError("fast и slow должны быть положительными")
+        if f >= sl:
+            raise ValueError("ожидается fast < slow")
+
+    c = close.to_numpy(dtype=np.float64)
+    windows = sorted({w for pair in pairs for w in pair})
+
+    # 1) SMA на каждую уникальную длину окна
+    if NUMBA_AVAILABLE:
+        smas = {w: aot(_rolling_mean_nb)(c, w) for w in windows}
+    else:
+        smas = {w: close.rolling(window=w, min_periods=w).mean().to_numpy(dtype=np.float64) for w in windows}
+
+    # 2) сравнение по парам
+    above = np.empty((len(c), len(pairs)), dtype=bool)
+    for k, (f, sl) in enumerate(pairs):
+        np.greater(smas[f], smas[sl], out=above[:, k])
+
+    # 3) лаг исполнения по оси времени, дыры → flat
+    target = _shift_fill_array(above.astype(np.float64), shift_for_execution)
+
+    columns = pd.MultiIndex.from_tuples(pairs, names=["fast", "slow"])
+    return pd.DataFrame(target, index=close.index, columns=columns, copy=False)
+
+
 # ============================
 # Zoo v1 — набор простых стратегий
 # ============================
@@ -115,9 +181,311 @@ def _apply_shift_and_fill(target: pd.Series, shift_for_execution: int) -> pd.Ser
     - стратегии отличались только торговой идеей,
     - а механика лагов была одинаковой.
     """
-    if shift_for_execution != 0:
-        target = target.shift(shift_for_execution)
-    return target.fillna(0.0).astype(float)
+    # Один проход по NumPy-буферу вместо shift + fillna + astype (три промежуточных Series).
+    arr = target.to_numpy(dtype=np.float64)
+    n = len(arr)
+    k = int(shift_for_execution)
+
+    if k == 0:
+        out = arr.copy()  # to_numpy может вернуть view на данные target
+    else:
+        out = np.zeros(n, dtype=np.float64)
+        if 0 < k < n:
+            out[k:] = arr[: n - k]
+        elif -n < k < 0:
+            out[: n + k] = arr[-k:]
+
+    # только NaN -> 0; inf оставляем как есть (как fillna)
+    np.copyto(out, 0.0, where=np.isnan(out))
+    return pd.Series(out, index=target.index, name=target.name, copy=False)
+
+
+def _shift_fill_array(target: np.ndarray, shift_for_execution: int) -> np.ndarray:
+    """
+    Массивный аналог _apply_shift_and_fill: сдвиг на k баров (по оси 0), дыры заполняем 0.
+    Без np.roll — значения с конца не "заворачиваются" в начало.
+    """
+    k = shift_for_execution
+    if k == 0:
+        return target
+    out = np.zeros_like(target)
+    if abs(k) < len(target):
+        if k > 0:
+            out[k:] = target[:-k]
+        else:
+            out[:k] = target[-k:]
+    return out
+
+
+def _positions_to_target(pos: np.ndarray, index: pd.Index, shift_for_execution: int) -> pd.Series:
+    """
+    Позиции машины состояний (0/1, int8 или float, без NaN) -> target float64 со
+    сдвигом исполнения. Сдвиг по компактному буферу, во float64 — одним проходом.
+    """
+    target = _shift_fill_array(pos, shift_for_execution).astype(np.float64, copy=False)
+    return pd.Series(target, index=index, copy=False)
+
+
+@njit(cache=True)
+def _rolling_mean_nb(values, window):
+    """
+    close.rolling(window, min_periods=window).mean() скалярным циклом.
+
+    Повторяет алгоритм pandas (roll_mean) один-в-один, чтобы результат совпадал
+    побитово: Kahan-компенсация отдельно для добавлений и удалений, NaN пропускаются
+    (окно с NaN => NaN), окно из одинаковых значений => само значение,
+    знаковая коррекция для окон одного знака.
+    """
+    n = values.shape[0]
+    out = np.empty(n)
+
+    nobs = 0
+    neg_ct = 0
+    sum_x = 0.0
+    comp_add = 0.0
+    comp_rem = 0.0
+    same = 0
+    prev = np.nan
+
+    for i in range(n):
+        s = max(i + 1 - window, 0)
+
+        if i == 0 or s >= i:
+            # окно не пересекается с предыдущим (window == 1) — считаем с нуля
+            nobs = 0
+            neg_ct = 0
+            sum_x = 0.0
+            comp_add = 0.0
+            comp_rem = 0.0
+            same = 0
+            prev = values[s]
+            lo = s
+        else:
+            # удаляем выпавшие из окна значения
+            for j in range(max(i - window, 0), s):
+                val = values[j]
+                if val == val:
+                    nobs -= 1
+                    y = -val - comp_rem
+                    t = sum_x + y
+                    comp_rem = t - sum_x - y
+                    sum_x = t
+                    if math.copysign(1.0, val) < 0.0:
+                        neg_ct -= 1
+            lo = i
+
+        # добавляем новые значения
+        for j in range(lo, i + 1):
+            val = values[j]
+            if val == val:
+                nobs += 1
+                y = val - comp_add
+                t = sum_x + y
+                comp_add = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, val) < 0.0:
+                    neg_ct += 1
+                if val == prev:
+                    same += 1
+                else:
+                    same = 1
+                prev = val
+
+        if nobs >= window and nobs > 0:
+            r = sum_x / nobs
+            if same >= nobs:
+                r = prev
+            elif neg_ct == 0 and r < 0.0:
+                r = 0.0
+            elif neg_ct == nobs and r > 0.0:
+                r = 0.0
+            out[i] = r
+        else:
+            out[i] = np.nan
+    return out
+
+
+@njit(cache=True)
+def _welford_add(val, nobs, mean_x, ssqdm_x, comp, unstable, inv_cond_tol):
+    """Один шаг Welford + Kahan при добавлении значения (NaN пропускается)."""
+    if val != val:
+        return nobs, mean_x, ssqdm_x, comp, unstable
+    prev_m2 = ssqdm_x
+    nobs += 1
+    prev_mean = mean_x - comp
+    y = val - comp
+    t = y - mean_x
+    comp = t + mean_x - y
+    mean_x += t / nobs
+    ssqdm_x += (val - prev_mean) * (val - mean_x)
+    if prev_m2 * inv_cond_tol > ssqdm_x:
+        unstable = True
+    return nobs, mean_x, ssqdm_x, comp, unstable
+
+
+@njit(cache=True)
+def _rolling_std_nb(values, window):
+    """
+    close.rolling(window, min_periods=window).std(ddof=0) скалярным циклом.
+
+    Повторяет pandas roll_var один-в-один: Welford с Kahan-компенсацией
+    отдельно для добавлений и удалений; при риске катастрофического сокращения
+    (M2 резко упал) окно пересчитывается с нуля. Затем sqrt, отрицательное
+    из-за округления => 0 (как zsqrt).
+    """
+    n = values.shape[0]
+    out = np.empty(n)
+    inv_cond_tol = np.finfo(np.float64).eps * 1e3
+
+    nobs = 0
+    mean_x = 0.0
+    ssqdm_x = 0.0
+    comp_add = 0.0
+    comp_rem = 0.0
+    unstable = False
+
+    for i in range(n):
+        s = max(i + 1 - window, 0)
+        recompute = i == 0 or s >= i
+
+        if not recompute:
+            # удаляем выпавшие из окна значения
+            for j in range(max(i - window, 0), s):
+                val = values[j]
+                if val == val:
+                    prev_m2 = ssqdm_x
+                    nobs -= 1
+                    if nobs:
+                        prev_mean = mean_x - comp_rem
+                        y = val - comp_rem
+                        t = y - mean_x
+                        comp_rem = t + mean_x - y
+                        mean_x -= t / nobs
+                        ssqdm_x -= (val - prev_mean) * (val - mean_x)
+                        if prev_m2 * inv_cond_tol > ssqdm_x:
+                            unstable = True
+                    else:
+                        mean_x = 0.0
+                        ssqdm_x = 0.0
+                        unstable = False
+
+            # добавляем новое значение
+            nobs, mean_x, ssqdm_x, comp_add, unstable = _welford_add(
+                values[i], nobs, mean_x, ssqdm_x, comp_add, unstable, inv_cond_tol
+            )
+
+        if recompute or unstable:
+            # окно с нуля: первое окно, window == 1 или численная нестабильность
+            nobs = 0
+            mean_x = 0.0
+            ssqdm_x = 0.0
+            comp_add = 0.0
+            comp_rem = 0.0
+            for j in range(s, i + 1):
+                nobs, mean_x, ssqdm_x, comp_add, unstable = _welford_add(
+                    values[j], nobs, mean_x, ssqdm_x, comp_add, unstable, inv_cond_tol
+                )
+            unstable = False
+
+        if nobs >= window and nobs > 0:
+            var = ssqdm_x / nobs
+            out[i] = math.sqrt(var) if var >= 0.0 else 0.0
+        else:
+            out[i] = np.nan
+    return out
+
+
+@njit(cache=True)
+def _rolling_mean_std(values, window):
+    """(rolling mean, rolling std ddof=0) одним вызовом — без двух pandas rolling-объектов."""
+    return _rolling_mean_nb(values, window), _rolling_std_nb(values, window)
+
+
+@njit(cache=True)
+def _sma_cross_loop(close, fast, slow, shift):
+    """
+    target[t + shift] = 1.0, если SMA_fast[t] > SMA_slow[t], иначе 0.0.
+    Бары, на которые сигнал ещё не "доехал" после shift, = 0.0 (flat).
+    """
+    n = close.shape[0]
+    sma_fast = _rolling_mean_nb(close, fast)
+    sma_slow = _rolling_mean_nb(close, slow)
+
+    out = np.zeros(n)
+    for i in range(n):
+        j = i + shift
+        if 0 <= j < n and sma_fast[i] > sma_slow[i]:
+            out[j] = 1.0
+    return out
+
+
+@njit(cache=True, error_model="numpy")
+def _rsi_nb(close, period):
+    """
+    RSI Уайлдера за один проход: delta, gain/loss и два сглаживания сразу.
+
+    Сглаживание повторяет pandas ewm(alpha=1/period, adjust=False,
+    min_periods=period).mean() побитово (та же арифметика весов, включая
+    ветку com == 1 и затухание веса на пропусках), чтобы сигналы не
+    зависели от того, установлена ли numba:
+    - среднее стартует с первого валидного delta (не с суммы первых period)
+    - NaN в close -> NaN delta: наблюдения нет, но вес прошлого затухает
+    - пока валидных delta < period -> NaN
+    error_model="numpy": avg_loss == 0 даёт inf/NaN, как в pandas.
+    """
+    n = close.shape[0]
+    out = np.empty(n)
+
+    # pandas пересчитывает alpha через center of mass
+    alpha = 1.0 / period
+    com = (1.0 - alpha) / alpha
+    alpha = 1.0 / (1.0 + com)
+    old_wt_factor = 1.0 - alpha
+
+    avg_gain = np.nan
+    avg_loss = np.nan
+    wt_gain = 1.0
+    wt_loss = 1.0
+    nobs = 0
+
+    for i in range(n):
+        d = close[i] - close[i - 1] if i > 0 else np.nan
+        is_obs = d == d
+        if is_obs:
+            nobs += 1
+            gain = d if d > 0.0 else 0.0
+            loss = -d if d < 0.0 else 0.0
+        else:
+            gain = np.nan
+            loss = np.nan
+
+        # --- gain ---
+        if avg_gain == avg_gain:
+            wt_gain *= old_wt_factor
+            new_wt = 1.0 - wt_gain if com == 1.0 else alpha
+            if is_obs:
+                if avg_gain != gain:
+                    avg_gain = (wt_gain * avg_gain + new_wt * gain) / (wt_gain + new_wt)
+                wt_gain = 1.0
+        elif is_obs:
+            avg_gain = gain
+
+        # --- loss ---
+        if avg_loss == avg_loss:
+            wt_loss *= old_wt_factor
+            new_wt = 1.0 - wt_loss if com == 1.0 else alpha
+            if is_obs:
+                if avg_loss != loss:
+                    avg_loss = (wt_loss * avg_loss + new_wt * loss) / (wt_loss + new_wt)
+                wt_loss = 1.0
+        elif is_obs:
+            avg_loss = loss
+
+        if nobs >= period:
+            out[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        else:
+            out[i] = np.nan
+    return out
 
 
 def _rsi(close: pd.Series, period: int) -> pd.Series:
@@ -138,10 +506,38 @@ def _rsi(close: pd.Series, period: int) -> pd.Series:
     if period <= 0:
         raise ValueError("RSI period must be positive")
 
-    delta = close.diff()
-
-    gain = delta.clip(lower=0.0)
-    loss = (-delta).clip(lower=0.0)
+    # Первые period баров — NaN (min_periods), но пропускать их нельзя: через
+    # них проходит рекуррентное состояние сглаживания (adjust=False). Сократить
+    # можно только ряд, который целиком короче окна — там считать нечего.
+    if len(close) <= period:
+        return pd.Series(np.full(len(close), np.nan), index=close.index, name=close.name, copy=False)
+
+    if NUMBA_AVAILABLE:
+        # один njit-проход вместо diff/clip/двух ewm/деления (результат тот же)
+        rsi = _rsi_nb(close.to_numpy(dtype=np.float64), int(period))
+        return pd.Series(rsi, index=close.index, name=close.name, copy=False)
+
+    # delta = close.diff() и разбиение на gains/losses — ufunc-проходами по одному буферу
+    # (np.maximum сохраняет NaN, как clip(lower=0.0))
+    c = close.to_numpy(dtype=np.float64)
+    delta = np.empty_like(c)
+    delta[:1] = np.nan
+    np.subtract(c[1:], c[:-1], out=delta[1:])
+
+    gain = np.maximum(delta, 0.0)
+    np.negative(delta, out=delta)
+    loss = np.maximum(delta, 0.0)
+
+    # Wilder smoothing одним IIR-фильтром (scipy), если в данных нет пропусков
+    avg_gain = _wilder_smooth(gain, period)
+    avg_loss = _wilder_smooth(loss, period) if avg_gain is not None else None
+    if avg_gain is not None and avg_loss is not None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+        return pd.Series(rsi, index=close.index, name=close.name, copy=False)
+
+    gain = pd.Series(gain, index=close.index, name=close.name, copy=False)
+    loss = pd.Series(loss, index=close.index, name=close.name, copy=False)
 
     # Wilder smoothing: ewm(alpha=1/period, adjust=False)
     avg_gain = gain.ewm(alpha=1.0 / period, adjust=False, min_periods=period).mean()
@@ -150,14 +546,213 @@ def _rsi(close: pd.Series, period: int) -> pd.Series:
     rs = avg_gain / avg_loss
     rsi = 100.0 - (100.0 / (1.0 + rs))
 
-    return rsi.astype(float)
+    # rsi уже float64 после деления — astype(float) дал бы лишнюю копию
+    return rsi if rsi.dtype == np.float64 else rsi.astype(np.float64)
+
+
+def _wilder_smooth(x: np.ndarray, period: int) -> Optional[np.ndarray]:
+    """
+    ewm(alpha=1/period, adjust=False, min_periods=period).mean() для x = [NaN, x1, x2, ...]
+    как IIR первого порядка: avg[t] = (1 - alpha) * avg[t-1] + alpha * x[t], avg[1] = x1.
+
+    scipy.signal.lfilter — цикл в C без ewm-объекта. Совпадает с pandas до
+    округления (~1e-15 относительно, не побитово). None, если scipy нет или
+    в x есть пропуски кроме x[0] (их весовую логику ewm оставляем pandas).
+    """
+    try:
+        from scipy.signal import lfilter
+    except ImportError:
+        return None
+
+    n = len(x)
+    if n < 3 or np.isnan(x[1:]).any():
+        return None
+
+    alpha = 1.0 / period
+    out = np.empty(n, dtype=np.float64)
+    out[1] = x[1]
+    out[2:], _ = lfilter([alpha], [1.0, -(1.0 - alpha)], x[2:], zi=[(1.0 - alpha) * x[1]])
+    out[:period] = np.nan  # min_periods: на баре t накоплено t наблюдений
+    return out
+
+
+# ------------------------------------------------------------
+# njit-ядра машин состояний (long/flat): один проход по готовым массивам.
+# Логика один-в-один с Python-циклами в generate_signals (они — fallback
+# без numba): NaN на входе => flat и сброс состояния.
+# Позиция 0/1 пишется в int8-буфер (в 8 раз меньше float64); во float64
+# переводим один раз, уже со сдвигом исполнения (_positions_to_target).
+# ------------------------------------------------------------
+
+@njit(cache=True)
+def _zscore_loop(z, entry_z, exit_z):
+    """z-score: вход при z <= -entry_z, выход при z >= -exit_z."""
+    n = z.shape[0]
+    out = np.empty(n, dtype=np.int8)
+    in_pos = 0
+    for i in range(n):
+        zt = z[i]
+        if np.isnan(zt):
+            in_pos = 0
+        elif in_pos <= 0:
+            if zt <= -entry_z:
+                in_pos = 1
+        elif zt >= -exit_z:
+            in_pos = 0
+        out[i] = in_pos
+    return out
+
+
+@njit(cache=True, parallel=True)
+def _zscore_grid_nb(close, windows, win_idx, entry_zs, exit_zs):
+    """
+    Сетка z-score: pos[:, k] = _zscore_loop(z[win_idx[k]], entry_zs[k], exit_zs[k]).
+
+    1) z на каждое уникальное окно (параллельно по окнам)
+    2) машины состояний по тройкам параметров (параллельно по тройкам)
+    Тройки независимы — без общих записей, результат не зависит от числа потоков.
+    """
+    n = close.shape[0]
+    n_win = windows.shape[0]
+    n_par = win_idx.shape[0]
+
+    z = np.empty((n_win, n))
+    for w in prange(n_win):
+        ma, sd = _rolling_mean_std(close, windows[w])
+        for i in range(n):
+            # std == 0 => NaN (как sd[sd == 0.0] = nan)
+            z[w, i] = (close[i] - ma[i]) / sd[i] if sd[i] != 0.0 else np.nan
+
+    out = np.empty((n, n_par), dtype=np.int8)
+    for k in prange(n_par):
+        out[:, k] = _zscore_loop(z[win_idx[k]], entry_zs[k], exit_zs[k])
+    return out
+
+
+@njit(cache=True)
+def _rsi_loop(rsi, entry, exit_):
+    """RSI: вход при rsi < entry, выход при rsi > exit."""
+    n = rsi.shape[0]
+    out = np.empty(n, dtype=np.int8)
+    in_pos = 0
+    for i in range(n):
+        rt = rsi[i]
+        if np.isnan(rt):
+            in_pos = 0
+        elif in_pos <= 0:
+            if rt < entry:
+                in_pos = 1
+        elif rt > exit_:
+            in_pos = 0
+        out[i] = in_pos
+    return out
+
+
+@njit(cache=True)
+def _rolling_extreme_shift1(values, window, take_max):
+    """
+    rolling(window, min_periods=window).max()/.min() со сдвигом shift(1) — за O(N).
+
+    Монотонная очередь индексов (кольцевой буфер): кандидаты в экстремум окна,
+    значения по ним монотонны — хвост выкидываем, пока новое значение "не хуже",
+    голову — когда она выпала из окна. Окно с NaN/inf => NaN (как pandas:
+    inf там тоже превращается в NaN, и при min_periods=window результата нет).
+    """
+    n = values.shape[0]
+    out = np.empty(n)
+    if n > 0:
+        out[0] = np.nan
+
+    dq = np.empty(window, dtype=np.int64)
+    head = 0
+    size = 0
+    last_bad = -1  # индекс последнего NaN/inf
+
+    for i in range(n - 1):
+        x = values[i]
+        if not np.isfinite(x):
+            last_bad = i
+        else:
+            while size > 0:
+                b = dq[(head + size - 1) % window]
+                if (values[b] <= x) if take_max else (values[b] >= x):
+                    size -= 1
+                else:
+                    break
+            # головы, выпавшие из окна [i - window + 1, i] (после NaN их может быть несколько)
+            while size > 0 and dq[head] <= i - window:
+                head = (head + 1) % window
+                size -= 1
+            dq[(head + size) % window] = i
+            size += 1
+
+        if i < window - 1 or last_bad > i - window:
+            out[i + 1] = np.nan
+        else:
+            out[i + 1] = values[dq[head]]
+    return out
+
+
+def _channel_bound(values: np.ndarray, index: pd.Index, window: int, take_max: bool) -> np.ndarray:
+    """rolling(window).max()/.min() со shift(1) — граница канала Donchian."""
+    if NUMBA_AVAILABLE:
+        # монотонная очередь: O(N) на окно, shift(1) прямо в kernel
+        return aot(_rolling_extreme_shift1)(values, window, take_max)
+    r = pd.Series(values, index=index, copy=False).rolling(window, min_periods=window)
+    return (r.max() if take_max else r.min()).shift(1).to_numpy(dtype=np.float64)
+
+
+@njit(cache=True)
+def _donchian_loop(close, high_n, low_m):
+    """Donchian: вход при close > high_n, выход при close < low_m (границы уже со shift(1))."""
+    n = close.shape[0]
+    out = np.empty(n, dtype=np.int8)
+    in_pos = 0
+    for i in range(n):
+        hn = high_n[i]
+        lm = low_m[i]
+        if np.isnan(hn) or np.isnan(lm):
+            in_pos = 0
+        elif in_pos <= 0:
+            if close[i] > hn:
+                in_pos = 1
+        elif close[i] < lm:
+            in_pos = 0
+        out[i] = in_pos
+    return out
+
+
+def _latch_positions(entry: np.ndarray, exit_: np.ndarray, reset: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Векторная long/flat машина состояний без цикла ("защёлка" через ffill):
+    - entry  => 1.0, exit_ => 0.0, иначе держим последнее состояние
+    - reset  => 0.0 (нет данных: flat и сброс, как в циклах)
+
+    Совпадает с циклом, только если entry и exit_ не срабатывают на одном баре
+    (тогда результат цикла зависит от текущего состояния) — в этом случае None,
+    и вызывающий код идёт в цикл.
+    """
+    if (entry & exit_ & ~reset).any():
+        return None
+
+    n = len(entry)
+    trig = np.full(n, np.nan)
+    trig[exit_] = 0.0
+    trig[entry] = 1.0
+    trig[reset] = 0.0
+
+    # ffill: номер последнего бара с триггером (бегущий максимум позиций)
+    last = np.where(np.isnan(trig), -1, np.arange(n))
+    np.maximum.accumulate(last, out=last)
+    out = np.where(last >= 0, trig[np.maximum(last, 0)], 0.0)
+    return out
 
 
 # ------------------------------------------------------------
 # 1) Buy&Hold (sanity / baseline)
 # ------------------------------------------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BuyHoldParams:
     """
     Параметры Buy&Hold.
@@ -188,18 +783,18 @@ class BuyHoldStrategy(Strategy):
     def generate_signals(self, md: MarketData) -> Signals:
         idx = md.bars.index
 
-        # На каждом баре говорим: хотим держать allocation_fraction
-        target = pd.Series(self.params.allocation_fraction, index=idx, dtype=float)
-
-        target = _apply_shift_and_fill(target, self.params.shift_for_execution)
-        return Signals(target_position=target)
+        # На каждом баре говорим: хотим держать allocation_fraction;
+        # первые shift баров — flat. Сразу массивом: [0, .., 0, f, f, ..., f]
+        target = np.full(len(idx), float(self.params.allocation_fraction))
+        target = _shift_fill_array(target, self.params.shift_for_execution)
+        return Signals(target_position=pd.Series(target, index=idx, copy=False))
 
 
 # ------------------------------------------------------------
 # 2) Time-Series Momentum (простая тренд-идея)
 # ------------------------------------------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TSMomParams:
     """
     lookback:
@@ -230,22 +825,28 @@ class TimeSeriesMomentumStrategy(Strategy):
             raise ValueError("lookback must be positive")
 
     def generate_signals(self, md: MarketData) -> Signals:
-        close = md.bars["Close"].astype(float)
-
-        # Доходность за lookback баров (грубая, без лог-доходностей)
-        ret = close / close.shift(self.params.lookback) - 1.0
+        arrays = md.arrays
+        c = arrays.close
+        lb = self.params.lookback
 
-        target = (ret > 0.0).astype(float)
+        # Доходность за lookback баров (грубая, без лог-доходностей) — по голому
+        # float64-массиву; бары без истории (и NaN) => ret > 0 ложно => flat.
+        # float32 здесь не берём: округление цен сдвигает знак ret около нуля.
+        above = np.zeros(len(c), dtype=bool)
+        if lb < len(c):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ret = c[lb:] / c[:-lb] - 1.0
+            np.greater(ret, 0.0, out=above[lb:])
 
-        target = _apply_shift_and_fill(target, self.params.shift_for_execution)
-        return Signals(target_position=target)
+        target = _shift_fill_array(above.astype(np.float64), self.params.shift_for_execution)
+        return Signals(target_position=pd.Series(target, index=arrays.index, name="Close", copy=False))
 
 
 # ------------------------------------------------------------
 # 3) Mean Reversion по Z-score (диапазон / возврат к среднему)
 # ------------------------------------------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ZScoreReversionParams:
     """
     window:
@@ -291,49 +892,125 @@ class ZScoreMeanReversionStrategy(Strategy):
         # exit_z может быть 0 или даже отрицательным (более ранний выход), но обычно 0
 
     def generate_signals(self, md: MarketData) -> Signals:
-        close = md.bars["Close"].astype(float)
+        arrays = md.arrays
+        window = self.params.window
+        z_arr = arrays.memo(("zscore", "Close", window), lambda: _zscore(arrays.close_series(), window))
 
-        ma = close.rolling(window=self.params.window, min_periods=self.params.window).mean()
-        sd = close.rolling(window=self.params.window, min_periods=self.params.window).std(ddof=0)
+        # Машина состояний: position ∈ {0,1}
+        pos = _zscore_positions(z_arr, float(self.params.entry_z), float(self.params.exit_z))
 
-        # Защита от деления на 0 (на спокойных инструментах std может быть очень мал)
-        sd = sd.replace(0.0, np.nan)
+        target = _positions_to_target(pos, arrays.index, self.params.shift_for_execution)
+        return Signals(target_position=target)
 
-        z = (close - ma) / sd
 
-        # Машина состояний: position ∈ {0,1}
-        pos = []
-        in_pos = 0.0
+def _zscore(close: pd.Series, window: int) -> np.ndarray:
+    """z = (Close - MA) / STD (ddof=0) на rolling-окне; std == 0 => NaN."""
+    c = close.to_numpy(dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        # mean и std одним njit-вызовом (та же арифметика, что у pandas rolling)
+        ma, sd = aot(_rolling_mean_std)(c, window)
+    else:
+        ma = close.rolling(window=window, min_periods=window).mean().to_numpy(dtype=np.float64)
+        sd = close.rolling(window=window, min_periods=window).std(ddof=0).to_numpy(dtype=np.float64)
+
+    # Защита от деления на 0 (на спокойных инструментах std может быть очень мал):
+    # std == 0 (и NaN) => z = NaN. Вычитание и деление — in-place в один буфер
+    # под маской, вместо replace + двух временных массивов.
+    valid = sd > 0.0
+    z = np.full_like(c, np.nan)
+    np.subtract(c, ma, out=z, where=valid)
+    np.divide(z, sd, out=z, where=valid)
+    return z
+
+
+def _zscore_positions(z_arr: np.ndarray, entry_z: float, exit_z: float) -> np.ndarray:
+    """Машина состояний z-score: вход при z <= -entry_z, выход при z >= -exit_z."""
+    if NUMBA_AVAILABLE:
+        return aot(_zscore_loop)(z_arr, entry_z, exit_z)
+
+    # Без numba — векторная защёлка (ffill триггеров). Вход z <= -entry_z и
+    # выход z >= -exit_z не пересекаются при exit_z < entry_z; иначе на одном
+    # баре срабатывают оба, исход зависит от состояния — тогда цикл.
+    with np.errstate(invalid="ignore"):
+        latched = _latch_positions(z_arr <= -entry_z, z_arr >= -exit_z, np.isnan(z_arr))
+    if latched is not None:
+        return latched
+
+    pos = []  # append в list быстрее поэлементной записи в ndarray из Python
+    in_pos = 0.0
+
+    # идём по готовому массиву (позиционно), без z.loc[ts] на каждом баре
+    for zt in z_arr.tolist():
+        if zt != zt:  # NaN
+            # пока нет данных для rolling — не торгуем
+            in_pos = 0.0
+        else:
+            if in_pos <= 0.0:
+                # Условие входа: сильная перепроданность
+                if zt <= -entry_z:
+                    in_pos = 1.0
+            else:
+                # Условие выхода: возврат к среднему
+                if zt >= -exit_z:
+                    in_pos = 0.0
 
-        for ts in close.index:
-            zt = z.loc[ts]
+        pos.append(in_pos)
 
-            if np.isnan(zt):
-                # пока нет данных для rolling — не торгуем
-                in_pos = 0.0
-            else:
-                if in_pos <= 0.0:
-                    # Условие входа: сильная перепроданность
-                    if zt <= -self.params.entry_z:
-                        in_pos = 1.0
-                else:
-                    # Условие выхода: возврат к среднему
-                    if zt >= -self.params.exit_z:
-                        in_pos = 0.0
+    # в компактный буфер — одним вызовом после цикла
+    return np.array(pos, dtype=np.int8)
 
-            pos.append(in_pos)
 
-        target = pd.Series(pos, index=close.index, dtype=float)
+def generate_zscore_signals_grid(
+    close: pd.Series,
+    windows: Sequence[int],
+    entry_zs: Sequence[float],
+    exit_zs: Sequence[float],
+    shift_for_execution: int = 1,
+) -> pd.DataFrame:
+    """
+    ZScoreMeanReversion сразу для сетки параметров: K троек (windows[k], entry_zs[k], exit_zs[k]).
 
-        target = _apply_shift_and_fill(target, self.params.shift_for_execution)
-        return Signals(target_position=target)
+    Возвращает DataFrame [T, K] с колонками MultiIndex (window, entry_z, exit_z);
+    колонка k совпадает с ZScoreMeanReversionStrategy(ZScoreReversionParams(...)).generate_signals(...).
+
+    z-score считается один раз на уникальное окно; с numba окна и тройки
+    параметров разбираются параллельно (prange) внутри одного kernel.
+    """
+    if not (len(windows) == len(entry_zs) == len(exit_zs)):
+        raise ValueError("windows, entry_zs и exit_zs должны быть одной длины")
+    combos = [(int(w), float(en), float(ex)) for w, en, ex in zip(windows, entry_zs, exit_zs)]
+    for w, en, _ in combos:
+        if w <= 1:
+            raise ValueError("window must be > 1")
+        if en <= 0:
+            raise ValueError("entry_z must be positive")
+
+    uniq = sorted({w for w, _, _ in combos})
+    win_idx = np.array([uniq.index(w) for w, _, _ in combos], dtype=np.int64)
+    entry = np.array([en for _, en, _ in combos], dtype=np.float64)
+    exit_ = np.array([ex for _, _, ex in combos], dtype=np.float64)
+
+    if NUMBA_AVAILABLE:
+        c = close.to_numpy(dtype=np.float64)
+        pos = _zscore_grid_nb(c, np.array(uniq, dtype=np.int64), win_idx, entry, exit_)
+    else:
+        close = close.astype(np.float64)
+        z = [_zscore(close, w) for w in uniq]
+        pos = np.empty((len(close), len(combos)), dtype=np.int8)
+        for k in range(len(combos)):
+            pos[:, k] = _zscore_positions(z[win_idx[k]], entry[k], exit_[k])
+
+    target = _shift_fill_array(pos, shift_for_execution).astype(np.float64, copy=False)
+
+    columns = pd.MultiIndex.from_tuples(combos, names=["window", "entry_z", "exit_z"])
+    return pd.DataFrame(target, index=close.index, columns=columns, copy=False)
 
 
 # ------------------------------------------------------------
 # 4) RSI(2) Mean Reversion (очень популярный простой вариант)
 # ------------------------------------------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RSIReversionParams:
     """
     rsi_period:
@@ -375,15 +1052,21 @@ class RSIMeanReversionStrategy(Strategy):
             raise ValueError("entry should be < exit for sensible mean-reversion")
 
     def generate_signals(self, md: MarketData) -> Signals:
-        close = md.bars["Close"].astype(float)
-        rsi = _rsi(close, self.params.rsi_period)
+        arrays = md.arrays
+        close = arrays.close_series()
+        period = self.params.rsi_period
+        rsi_arr = arrays.memo(("rsi", "Close", period), lambda: _rsi(close, period).to_numpy(dtype=np.float64))
+
+        if NUMBA_AVAILABLE:
+            pos = aot(_rsi_loop)(rsi_arr, float(self.params.entry), float(self.params.exit))
+            target = _positions_to_target(pos, close.index, self.params.shift_for_execution)
+            return Signals(target_position=target)
 
         pos = []
         in_pos = 0.0
 
-        for ts in close.index:
-            rt = rsi.loc[ts]
-            if np.isnan(rt):
+        for rt in rsi_arr.tolist():
+            if rt != rt:  # NaN
                 in_pos = 0.0
             else:
                 if in_pos <= 0.0:
@@ -394,9 +1077,7 @@ class RSIMeanReversionStrategy(Strategy):
                         in_pos = 0.0
             pos.append(in_pos)
 
-        target = pd.Series(pos, index=close.index, dtype=float)
-
-        target = _apply_shift_and_fill(target, self.params.shift_for_execution)
+        target = _positions_to_target(np.array(pos, dtype=np.int8), close.index, self.params.shift_for_execution)
         return Signals(target_position=target)
 
 
@@ -404,7 +1085,7 @@ class RSIMeanReversionStrategy(Strategy):
 # 5) Donchian Breakout (канал, трендовая классика)
 # ------------------------------------------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DonchianBreakoutParams:
     """
     entry_window:
@@ -440,23 +1121,39 @@ class DonchianBreakoutStrategy(Strategy):
             raise ValueError("entry_window and exit_window must be > 1")
 
     def generate_signals(self, md: MarketData) -> Signals:
-        bars = md.bars
-        close = bars["Close"].astype(float)
-
-        # Границы канала по high/low
-        high_n = bars["High"].rolling(self.params.entry_window, min_periods=self.params.entry_window).max().shift(1)
-        low_m = bars["Low"].rolling(self.params.exit_window, min_periods=self.params.exit_window).min().shift(1)
+        arrays = md.arrays
+        close = arrays.close_series()
+
+        # Границы канала по high/low (общие для стратегий с тем же окном)
+        ew, xw = self.params.entry_window, self.params.exit_window
+        hn_arr = arrays.memo(("max_shift1", "High", ew), lambda: _channel_bound(arrays.high, arrays.index, ew, True))
+        lm_arr = arrays.memo(("min_shift1", "Low", xw), lambda: _channel_bound(arrays.low, arrays.index, xw, False))
+        close_arr = arrays.close
+
+        if NUMBA_AVAILABLE:
+            pos = aot(_donchian_loop)(close_arr, hn_arr, lm_arr)
+            target = _positions_to_target(pos, close.index, self.params.shift_for_execution)
+            return Signals(target_position=target)
+
+        # Без numba — векторная защёлка: вход по пробою вверх, выход по пробою вниз.
+        # При Low <= High на каждом баре low_m <= high_n, и оба условия на одном
+        # баре не срабатывают; если данные это нарушают — ниже обычный цикл.
+        with np.errstate(invalid="ignore"):
+            latched = _latch_positions(
+                close_arr > hn_arr,
+                close_arr < lm_arr,
+                np.isnan(hn_arr) | np.isnan(lm_arr),
+            )
+        if latched is not None:
+            target = _positions_to_target(latched, close.index, self.params.shift_for_execution)
+            return Signals(target_position=target)
 
         pos = []
         in_pos = 0.0
 
-        for ts in close.index:
-            hn = high_n.loc[ts]
-            lm = low_m.loc[ts]
-            ct = close.loc[ts]
-
+        for hn, lm, ct in zip(hn_arr.tolist(), lm_arr.tolist(), close_arr.tolist()):
             # Пока границы не определены — не торгуем
-            if np.isnan(hn) or np.isnan(lm):
+            if hn != hn or lm != lm:  # NaN
                 in_pos = 0.0
             else:
                 if in_pos <= 0.0:
@@ -468,7 +1165,5 @@ class DonchianBreakoutStrategy(Strategy):
 
             pos.append(in_pos)
 
-        target = pd.Series(pos, index=close.index, dtype=float)
-
-        target = _apply_shift_and_fill(target, self.params.shift_for_execution)
+        target = _positions_to_target(np.array(pos, dtype=np.int8), close.index, self.params.shift_for_execution)
         return Signals(target_position=target)